@@ -1,87 +1,201 @@
-from pylsl import StreamInlet, resolve_byprop
+from pylsl import StreamInlet, resolve_byprop, local_clock
 import time
-import torch
 import numpy as np
-import mne
-import pandas as pd
-import requests  # <-- Ajouté pour envoyer les commandes HTTP
-from EEGNet import EEGNet
+from ring_buffer import RingBuffer, InletReader
+from scheduler import InferenceScheduler
+from preprocessing import StreamingPreprocessor
+from command_dispatcher import CommandDispatcher
+from inference import build_engine
+from decision import DecisionEngine
+from metrics import Metrics, MetricsLogger, serve_metrics
+from model_reload import ModelWatcher
+from shared_ring import RingInlet, RingReader
+from bandpower import BandPowerEngine
 
 ESP32_IP = "http://10.1.224.145" # ESP32 local IP
 
 # Paramètres
+model_path = 'model/model.pth'
+classifier = "eegnet"   # "eegnet" ou "lda" (puissances de bandes + LDA, bandpower.py)
+lda_path = 'model/lda.npz'
+hot_reload = True    # Recharger model_path à chaud quand il change (réentraînement en cours de session)
+reload_interval = 1.0    # Secondes entre deux vérifications du fichier
 Fs = 256            
-n_channels = 4      
-Wn = 1               # Fenêtre de 1 seconde
-n_samples = int(Wn * Fs)  
+# Canaux et longueur de fenêtre : ceux déclarés par le modèle (EEGNet.input_shape)
+hop = 32             # Une inférence tous les 32 échantillons (125 ms)
+max_buflen = 2       # Secondes maximum gardées en file par LSL
+shared_ring = None   # Nom d'un anneau partagé (shared_ring.py) à lire au lieu d'un inlet LSL
+preprocess = True    # Filtrage 1-40 Hz + z-score, comme à l'entraînement
+num_threads = 1      # Threads torch pour l'inférence (fenêtre unique : 1 suffit)
+backend = "torchscript"  # "torchscript" (fp32), "int8" ou "onnx"
+parity_recording = None  # Enregistrement de référence pour valider un backend int8/onnx (None : le dernier de recording/)
+left_threshold = 0.85
+right_threshold = 0.95
+decision = "ema"     # "raw" (decide sur chaque fenêtre, seuils ci-dessus), "ema" ou "vote" ; réglages comparés par sweep.py
+enter_threshold = 0.7    # Probabilité lissée pour démarrer un mouvement
+exit_threshold = 0.5     # ... et en dessous de laquelle il s'arrête (hystérésis)
+min_dwell = 0.25         # Secondes minimum entre deux changements de commande
+metrics_port = 9108      # Endpoint Prometheus local (http://127.0.0.1:9108/metrics), None pour aucun
+metrics_log_interval = 10.0  # Secondes entre deux lignes JSON de mesures, None pour aucune
 
-# Charger le modèle PyTorch
+# Charger le modèle (state_dict, BN repliées, backend choisi validé contre le fp32, préchauffé)
 def load_model(model_path):
-    model = torch.load(model_path, weights_only=False)  # Charger le modèle
-    model.eval()  # Mode évaluation
+    if classifier == "lda":
+        model = BandPowerEngine.load(model_path)
+    else:
+        model = build_engine(model_path, backend, parity_recording=parity_recording, decide=validation_decide,
+                             num_threads=num_threads)
+    print("Fenêtre du modèle : %d canaux x %d échantillons (%.2f s)"
+          % (model.input_shape[0], model.input_shape[1], model.input_shape[1] / Fs))
     return model
 
 # Fonction de prédiction
-def predict(x_pred, model):
-    x_pred = np.transpose(x_pred, (0, 2, 1))
-    x_pred = x_pred[:, :, :, np.newaxis]
-    x_pred_tensor = torch.tensor(x_pred, dtype=torch.float32)  # Conversion en tensor PyTorch
-    with torch.no_grad():  # Désactiver le calcul des gradients pendant la prédiction
-        y_pred = model(x_pred_tensor)
-    return y_pred.numpy()  # Convertir le tensor PyTorch en numpy array
-
-# Fonction pour envoyer une commande à l'ESP32
-def send_command(command):
-    url = f"{ESP32_IP}/{command}"
-    try:
-        response = requests.get(url, timeout=1)
-        if response.status_code == 200:
-            print(f"Commande envoyée : {command}")
-        else:
-            print(f"⚠️ Erreur ESP32 (Code {response.status_code})")
-    except requests.exceptions.RequestException as e:
-        print(f"🚨 Erreur de connexion à l'ESP32 : {e}")
+def predict(window, model):
+    # window : (n_channels, n_samples), déjà au format attendu par le modèle -> pas de transposition
+    return model.predict(window)  # numpy (1, 3), quel que soit le backend
+
+# Règle de décision : un lot de sorties (N, 3) -> une commande par fenêtre
+# (seuils du module par défaut, explicites pour sweep.py)
+def decide(y_pred, left=None, right=None):
+    left = left_threshold if left is None else left
+    right = right_threshold if right is None else right
+    best = y_pred.argmax(axis=1)
+    confidence = y_pred.max(axis=1)
+    return np.where((best == 0) & (confidence > left), "left",
+                    np.where((best == 1) & (confidence > right), "right", "stop"))
+
+# Étage de décision de la boucle en ligne (lissage, hystérésis, durée minimale)
+def make_decision(period=None):
+    period = period or hop / Fs
+    if decision == "raw":
+        return DecisionEngine(period, calibrate=False, smoothing=None, exit_threshold=None, min_dwell=0,
+                              enter_threshold={"left": left_threshold, "right": right_threshold})
+    return DecisionEngine(period, smoothing=decision, enter_threshold=enter_threshold,
+                          exit_threshold=exit_threshold, min_dwell=min_dwell)
+
+# Règle de comparaison des moteurs (contrôle de parité, test de fumée du rechargement) :
+# celle de la boucle en "raw", sinon l'argmax par fenêtre qui alimente le lissage
+# (les seuils de decide masqueraient les désaccords sous les seuils)
+def validation_decide(y_pred):
+    return decide(y_pred) if decision == "raw" else y_pred.argmax(axis=1)
+
+# Chaîne d'acquisition : inlet -> buffer (prétraité, dimensionné par le modèle) -> ordonnanceur
+def make_scheduler(inlet, model, clock=local_clock, sleep=time.sleep):
+    n_channels, n_samples = model.input_shape
+    # Anneau partagé : lecture directe dans la mémoire partagée, sans copie intermédiaire
+    reader = RingReader(inlet) if isinstance(inlet, RingInlet) else InletReader(inlet)
+    # Le dernier canal (Right AUX) est ignoré
+    if getattr(model, "backend", None) == "lda":
+        # Filtrage et puissances de bandes au fil de l'eau : l'ordonnanceur renvoie les caractéristiques
+        buffer = model.feature_buffer(Fs)
+    elif preprocess:
+        buffer = StreamingPreprocessor(n_channels, n_samples, fs=Fs)
+    else:
+        buffer = RingBuffer(n_channels, n_samples)
+    return InferenceScheduler(reader, buffer, Fs, hop=hop, clock=clock, sleep=sleep)
+
+# Mesures : temps par étage, retards échantillon -> décision -> acquittement de l'ESP32
+def make_metrics(scheduler, dispatcher):
+    metrics = Metrics()
+    metrics.describe("stage_seconds", "Temps par étage de la boucle, par fenêtre (hors attente des échantillons)")
+    metrics.describe("sample_to_decision_seconds", "Dernier échantillon LSL (time_correction) -> commande décidée")
+    metrics.describe("sample_to_ack_seconds", "Échantillon LSL ayant déclenché une commande -> acquittement ESP32")
+    metrics.describe("http_rtt_seconds", "Aller-retour HTTP vers l'ESP32")
+    metrics.describe("dispatch_queue_seconds", "Attente d'une commande avant son envoi")
+
+    def on_ack(command, rtt, queue_wait, timestamp):
+        metrics.observe("http_rtt_seconds", rtt)
+        metrics.observe("dispatch_queue_seconds", queue_wait)
+        if timestamp is not None:
+            metrics.observe("sample_to_ack_seconds", scheduler.clock() - timestamp)
+
+    dispatcher.on_ack = on_ack
+    return metrics
+
+def record_tick(metrics, scheduler, dispatcher, forward, decision_time, send):
+    for stage, seconds in scheduler.timings.items():
+        metrics.observe("stage_seconds", seconds, stage)
+    metrics.observe("stage_seconds", forward, "forward")
+    metrics.observe("stage_seconds", decision_time, "decision")
+    metrics.observe("stage_seconds", send, "send")
+    sample_time = scheduler.sample_time()
+    if sample_time is not None:
+        metrics.observe("sample_to_decision_seconds", scheduler.clock() - sample_time)
+    metrics.set("ticks_total", scheduler.ticks, "counter")
+    metrics.set("dropped_samples_total", scheduler.dropped, "counter")
+    metrics.set("lag_seconds", scheduler.lag)
+    metrics.set("commands_sent_total", dispatcher.sent, "counter")
+    metrics.set("commands_coalesced_total", dispatcher.coalesced, "counter")
+    metrics.set("command_errors_total", dispatcher.errors, "counter")
 
 # Fonction principale
-def main():
-    print("🔍 Recherche d'un flux EEG...")
-    streams = resolve_byprop('type', 'EEG')
-    inlet = StreamInlet(streams[0]) 
-    samples = []
+def main(model):
+    if shared_ring:
+        # Mêmes échantillons que l'enregistreur, une seule réception réseau
+        inlet = RingInlet(shared_ring)
+    else:
+        print("🔍 Recherche d'un flux EEG...")
+        streams = resolve_byprop('type', 'EEG')
+        inlet = StreamInlet(streams[0], max_buflen=max_buflen)
+    scheduler = make_scheduler(inlet, model)
 
     # Collecter les premières données
-    for _ in range(n_samples):
-        sample, _ = inlet.pull_sample()
-        samples.append(sample[:-1])
+    scheduler.fill()
+
+    dispatcher = CommandDispatcher(ESP32_IP).start()  # Envoi HTTP en arrière-plan
+    metrics = make_metrics(scheduler, dispatcher)
+    server = serve_metrics(metrics, port=metrics_port) if metrics_port else None
+    logger = MetricsLogger(metrics, metrics_log_interval) if metrics_log_interval else None
+    if logger:
+        logger.start()
+    try:
+        control_loop(scheduler, model, dispatcher, metrics=metrics)
+    finally:
+        dispatcher.send("stop")  # Ne jamais laisser la voiture rouler
+        dispatcher.close()
+        if server:
+            server.shutdown()
+        if logger:
+            logger.close()
 
+# Boucle de contrôle : fenêtre -> prédiction -> commande
+# `on_tick(duree_inference, commande)` permet aux bancs d'essai de mesurer chaque pas
+def control_loop(scheduler, model, dispatcher, verbose=True, on_tick=None, decision_engine=None, metrics=None):
     last_command = "stop"  # Pour éviter d'envoyer la même commande plusieurs fois
+    if decision_engine is None:
+        decision_engine = make_decision()
 
     while True:
-        time.sleep(0.05)  # Attente avant le prochain échantillon
-        sample, _ = inlet.pull_sample()
-        samples.pop(0)  
-        samples.append(sample[:-1])  
-
-        # Préparer les données pour la prédiction
-        x_pred = np.array([samples])
-        y_pred = predict(x_pred, test_model)
+        # Fenêtre la plus récente, une fois `hop` nouveaux échantillons reçus
+        window = scheduler.next_window()
+        start = time.perf_counter()
+        y_pred = predict(window, model)
+        inference_time = time.perf_counter() - start
 
         # Prédiction et envoi de commande à l'ESP32
-        if y_pred[0][0] > y_pred[0][1] and y_pred[0][0] > y_pred[0][2] and y_pred[0][0] > 0.85:
-            command = "left"
-        elif y_pred[0][1] > y_pred[0][0] and y_pred[0][1] > y_pred[0][2] and y_pred[0][1] > 0.95:
-            command = "right"
-        else:
-            command = "stop"
+        command = decision_engine.update(y_pred)
+        decided = time.perf_counter()
 
         # Envoyer la commande uniquement si elle change
         if command != last_command:
-            send_command(command)
+            dispatcher.send(command, scheduler.sample_time())
             last_command = command
 
-        print(f"Prédiction : {command.upper()} (Confiance : {max(y_pred[0]):.2f})")
+        if metrics is not None:
+            record_tick(metrics, scheduler, dispatcher, inference_time, decided - start - inference_time,
+                        time.perf_counter() - decided)
+
+        if on_tick is not None:
+            on_tick(inference_time, command)
+        if verbose:
+            print(f"Prédiction : {command.upper()} (Confiance : {max(y_pred[0]):.2f}) "
+                  f"| Retard : {scheduler.lag * 1000:.0f} ms, ignorés : {scheduler.dropped}")
 
 # Exécution du programme
 if __name__ == '__main__':
-    test_model = load_model('model/model.pth')  # Charger le modèle
-    main()
+    path = lda_path if classifier == "lda" else model_path
+    test_model = load_model(path)  # Charger le modèle
+    if hot_reload:
+        test_model = ModelWatcher(path, test_model, load_model, reload_interval, parity_recording,
+                                  validation_decide).start()
+    main(test_model)
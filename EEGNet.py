@@ -9,11 +9,14 @@ from glob import glob
 import pandas as pd
 
 class EEGNet(nn.Module):
-    def __init__(self, num_classes = 3):
+    def __init__(self, num_classes = 3, n_channels = 4, n_samples = 256):
         super(EEGNet, self).__init__()
+
+        # Forme d'entrée (canaux, échantillons) : enregistrée dans le state_dict avec les poids
+        self.register_buffer("input_shape", torch.tensor([n_channels, n_samples]))
         
         # Première couche de convolution
-        self.conv1 = nn.Conv2d(in_channels=4, out_channels=2, kernel_size=(1, 4), stride=1, padding=(0, 2))
+        self.conv1 = nn.Conv2d(in_channels=n_channels, out_channels=2, kernel_size=(1, 4), stride=1, padding=(0, 2))
         self.batch_norm1 = nn.BatchNorm2d(2)
         self.activation1 = nn.ReLU()
 
@@ -28,11 +31,16 @@ class EEGNet(nn.Module):
         self.activation3 = nn.ReLU()
 
         # Couches fully connected
-        self.fc = nn.Linear(8 * 255 * 2, 64)  # 8 * 255 * 2 = 4080
+        # Taille aplatie déduite de la forme d'entrée (8 * 255 * 2 = 4080 pour 4 x 256)
+        self.eval()  # Passe à vide sans toucher aux statistiques des BatchNorm
+        with torch.no_grad():
+            n_features = self.features(torch.zeros(1, n_channels, n_samples, 1)).numel()
+        self.train()
+        self.fc = nn.Linear(n_features, 64)
         self.out = nn.Linear(64, num_classes)  # Par exemple, 28 classes
         self.dropout = nn.Dropout(0.5)
 
-    def forward(self, x):
+    def features(self, x):
         # Appliquer les convolutions et activations
         x = self.conv1(x)
         x = self.batch_norm1(x)
@@ -45,7 +53,10 @@ class EEGNet(nn.Module):
         x = self.conv2(x)
         x = self.batch_norm3(x)
         x = self.activation3(x)
+        return x
 
+    def forward(self, x):
+        x = self.features(x)
 
         # Appliquer la couche fully connected
         x = x.view(x.size(0), -1)  # Aplatir la sortie
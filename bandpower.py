@@ -0,0 +1,220 @@
+"""Puissances de bandes (delta à gamma) et classifieur linéaire (LDA), alternative légère à EEGNet.
+
+Caractéristiques : spectre de Welch de chaque canal (segments de 0.5 s, Hann,
+moyenne retirée), normalisé segment par segment par la puissance totale, puis
+moyenne des segments de la fenêtre et log de la part de chaque bande. La
+normalisation rend les caractéristiques insensibles au z-score : elles sont
+identiques sur les fenêtres z-scorées de l'entraînement et sur le signal
+simplement filtré du flux en ligne.
+
+En ligne, `SlidingBandPower` remplace le StreamingPreprocessor de
+l'ordonnanceur : à chaque pas de `step` échantillons, seul le nouveau segment
+passe par une FFT, la somme des segments de la fenêtre est tenue à jour et le
+classifieur n'est qu'un produit matriciel.
+
+    python bandpower.py data/epochs --output model/lda.npz
+    BCI_predict.classifier = "lda"
+"""
+import argparse
+import os
+
+import numpy as np
+from scipy.signal import lfilter
+
+from preprocessing import LOWCUT, HIGHCUT, ORDER, butter_bandpass
+from ring_buffer import RingBuffer
+
+BANDS = {
+    "delta": (1.0, 4.0),
+    "theta": (4.0, 8.0),
+    "alpha": (8.0, 13.0),
+    "beta": (13.0, 30.0),
+    "gamma": (30.0, 40.0),   # Limité par le passe-bande 1-40 Hz
+}
+SEGMENT = 128   # 0.5 s à 256 Hz : résolution de 2 Hz
+STEP = 16       # Un nouveau segment tous les 16 échantillons
+
+
+def band_matrix(fs=256, segment=SEGMENT, bands=BANDS):
+    """(n_freqs, n_bands) : somme des raies rfft de chaque bande [basse, haute[."""
+    freqs = np.fft.rfftfreq(segment, 1.0 / fs)
+    return np.stack([(freqs >= low) & (freqs < high) for low, high in bands.values()], axis=1).astype(np.float64)
+
+
+def segment_powers(segments, taper, matrix):
+    """Parts de chaque bande pour des segments (..., segment) -> (..., n_bands)."""
+    segments = segments - segments.mean(axis=-1, keepdims=True)
+    spectrum = np.abs(np.fft.rfft(segments * taper, axis=-1)) ** 2
+    powers = spectrum @ matrix
+    return powers / np.maximum(powers.sum(axis=-1, keepdims=True), 1e-20)
+
+
+def band_power_features(windows, fs=256, segment=SEGMENT, step=STEP, bands=BANDS):
+    """Caractéristiques d'un lot de fenêtres (N, channels, samples) -> (N, channels, n_bands) float32.
+
+    Les segments sont alignés sur la fin de la fenêtre, comme en ligne.
+    """
+    windows = np.asarray(windows, dtype=np.float64)
+    n_samples = windows.shape[-1]
+    first = (n_samples - segment) % step
+    segments = np.lib.stride_tricks.sliding_window_view(windows[..., first:], segment, axis=-1)[..., ::step, :]
+    powers = segment_powers(segments, np.hanning(segment), band_matrix(fs, segment, bands))
+    return np.log(powers.mean(axis=-2)).astype(np.float32)
+
+
+class SlidingBandPower:
+    """Filtrage causal + puissances de bandes incrémentales ; remplace StreamingPreprocessor.
+
+    Même interface pour InferenceScheduler (`extend`, `window`, `full`, `total`),
+    mais `window()` renvoie les caractéristiques (channels, n_bands) de la
+    fenêtre de `n_samples` qui se termine au dernier multiple de `step`
+    échantillons du flux (au plus `step - 1` échantillons de retard).
+    """
+
+    def __init__(self, n_channels, n_samples, fs=256, segment=SEGMENT, step=STEP, bands=BANDS,
+                 lowcut=LOWCUT, highcut=HIGHCUT, order=ORDER):
+        self.n_channels = n_channels
+        self.n_samples = n_samples
+        self.segment = segment
+        self.step = step
+        self.b, self.a = butter_bandpass(lowcut, highcut, fs, order)
+        self.zi = np.zeros((max(len(self.a), len(self.b)) - 1, n_channels))
+        # Assez d'historique pour les segments qui se terminent dans un chunk de LSL_MAX_CHUNK
+        self.buffer = RingBuffer(n_channels, n_samples + segment)
+        self.taper = np.hanning(segment)
+        self.matrix = band_matrix(fs, segment, bands)
+        self.n_segments = (n_samples - segment) // step + 1
+        # Parts de bandes des derniers segments (anneau) et leur somme glissante
+        self._powers = np.zeros((self.n_segments, n_channels, len(bands)))
+        self._sum = np.zeros((n_channels, len(bands)))
+        self._next = 0
+        self.segments = 0
+        self._out = np.empty((n_channels, len(bands)), dtype=np.float32)
+
+    @property
+    def full(self):
+        return self.segments >= self.n_segments
+
+    @property
+    def total(self):
+        return self.buffer.total
+
+    def extend(self, chunk):
+        n = len(chunk)
+        if n == 0:
+            return
+        filtered, self.zi = lfilter(self.b, self.a, chunk, axis=0, zi=self.zi)
+        before = self.buffer.total
+        self.buffer.extend(filtered)
+        after = self.buffer.total
+        # Segments qui se terminent sur un multiple de `step` dans ce chunk (un seul au rythme habituel)
+        ends = np.arange((before // self.step + 1) * self.step, after + 1, self.step)
+        ends = ends[(ends >= self.segment) & (ends >= after - self.buffer.n_samples + self.segment)]
+        if len(ends) == 0:
+            return
+        window = self.buffer.window()
+        offsets = ends - (after - self.buffer.n_samples)
+        segments = np.stack([window[:, end - self.segment:end] for end in offsets], axis=1)
+        powers = segment_powers(segments, self.taper, self.matrix)   # (channels, k, n_bands)
+        for k in range(powers.shape[1]):
+            self._sum += powers[:, k] - self._powers[self._next]
+            self._powers[self._next] = powers[:, k]
+            self._next = (self._next + 1) % self.n_segments
+            self.segments += 1
+        if self.segments % 1024 < powers.shape[1]:
+            self._sum = self._powers.sum(axis=0)   # Recalcul exact pour éviter la dérive numérique
+
+    def window(self):
+        np.log(self._sum / self.n_segments, out=self._out, casting="unsafe")
+        return self._out
+
+
+class BandPowerEngine:
+    """LDA sur puissances de bandes, avec l'interface des moteurs d'inference.py.
+
+    `predict` / `predict_batch` acceptent des fenêtres prétraitées (channels,
+    samples), comme EEGNet, ou des caractéristiques (channels, n_bands) déjà
+    calculées par `feature_buffer`. Les sorties sont les fonctions discriminantes
+    de la LDA ([gauche, droite, stop]) : leur softmax donne les probabilités a posteriori.
+    """
+
+    backend = "lda"
+
+    def __init__(self, coef, intercept, mean, scale, n_channels=4, n_samples=256, fs=256,
+                 segment=SEGMENT, step=STEP, bands=BANDS):
+        self.input_shape = (n_channels, n_samples)
+        self.window_shape = (n_channels, len(bands))   # Ce que renvoie feature_buffer
+        self.fs, self.segment, self.step, self.bands = fs, segment, step, dict(bands)
+        # Standardisation repliée dans les poids : un seul produit matriciel
+        self.weights = np.ascontiguousarray((coef / scale).T, dtype=np.float32)
+        self.bias = (intercept - (coef / scale) @ mean).astype(np.float32)
+        self.coef, self.intercept, self.mean, self.scale = coef, intercept, mean, scale
+
+    def features(self, windows):
+        return band_power_features(windows, self.fs, self.segment, self.step, self.bands)
+
+    def feature_buffer(self, fs=None):
+        return SlidingBandPower(*self.input_shape, fs=fs or self.fs, segment=self.segment, step=self.step,
+                                bands=self.bands)
+
+    def predict_batch(self, windows):
+        """(N, channels, samples) ou (N, channels, n_bands) -> numpy (N, 3)."""
+        if windows.shape[-1] != len(self.bands):
+            windows = self.features(windows)
+        return windows.reshape(len(windows), -1) @ self.weights + self.bias
+
+    def predict(self, window):
+        """(channels, samples) ou (channels, n_bands) -> numpy (1, 3)."""
+        return self.predict_batch(window[np.newaxis])
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, coef=self.coef, intercept=self.intercept, mean=self.mean, scale=self.scale,
+                 input_shape=self.input_shape, fs=self.fs, segment=self.segment, step=self.step,
+                 band_names=list(self.bands), band_edges=list(self.bands.values()))
+        os.replace(tmp_path, path)   # Le rechargement à chaud ne lit jamais un fichier à moitié écrit
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            bands = dict(zip(f["band_names"].tolist(), map(tuple, f["band_edges"].tolist())))
+            return cls(f["coef"], f["intercept"], f["mean"], f["scale"], *f["input_shape"].tolist(),
+                       fs=int(f["fs"]), segment=int(f["segment"]), step=int(f["step"]), bands=bands)
+
+
+def train_lda(windows, labels, n_classes=3, fs=256, segment=SEGMENT, step=STEP, bands=BANDS):
+    """Entraîne la LDA (covariance à rétrécissement de Ledoit-Wolf) sur des fenêtres prétraitées."""
+    from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+
+    missing = set(range(n_classes)) - set(np.unique(labels).tolist())
+    if missing:
+        raise ValueError("Classes absentes des données d'entraînement : %s" % sorted(missing))
+    x = band_power_features(windows, fs, segment, step, bands).reshape(len(windows), -1).astype(np.float64)
+    mean, scale = x.mean(axis=0), x.std(axis=0) + 1e-12
+    lda = LinearDiscriminantAnalysis(solver="lsqr", shrinkage="auto").fit((x - mean) / scale, labels)
+    n_channels, n_samples = windows.shape[1:]
+    return BandPowerEngine(lda.coef_, lda.intercept_, mean, scale, n_channels, n_samples, fs, segment, step, bands)
+
+
+if __name__ == '__main__':
+    from train import TRAIN_LABELS, load_training_data, split_groups
+
+    parser = argparse.ArgumentParser(description="Entraînement du classifieur LDA sur puissances de bandes")
+    parser.add_argument("data", help="Dossier de build_dataset.py ou de CSV pré-découpés")
+    parser.add_argument("--output", default="model/lda.npz")
+    parser.add_argument("--val-fraction", type=float, default=0.2, help="Part des enregistrements gardés pour la validation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    windows, labels, groups = load_training_data(args.data)
+    val = split_groups(groups, args.val_fraction, args.seed)
+    if val.any():
+        engine = train_lda(windows[~val], labels[~val], len(TRAIN_LABELS))
+        accuracy = (engine.predict_batch(windows[val]).argmax(axis=1) == labels[val]).mean()
+        print(f"Validation : {accuracy:.1%} sur {int(val.sum())} fenêtres")
+    engine = train_lda(windows, labels, len(TRAIN_LABELS))   # Modèle final sur toutes les données
+    engine.save(args.output)
+    print("✅ LDA entraînée et exportée :", args.output)
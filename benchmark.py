@@ -0,0 +1,104 @@
+"""Banc d'essai de la boucle en ligne, sans casque ni voiture.
+
+Rejoue un enregistrement dans la même chaîne que BCI_predict.main
+(make_scheduler + control_loop) et envoie les commandes au faux ESP32 :
+
+    python benchmark.py EEG_recording.csv --speed 0       # aussi vite que possible
+    python benchmark.py EEG_recording.csv --speed 1       # temps réel
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+import BCI_predict
+from BCI_predict import control_loop, make_decision, make_metrics, make_scheduler
+from bandpower import BandPowerEngine
+from command_dispatcher import CommandDispatcher
+from fake_esp32 import serve
+from inference import BACKENDS, build_engine
+from replay import ReplayFinished, ReplaySource
+
+
+def percentiles(values, scale=1000):
+    if len(values) == 0:
+        return {}
+    values = np.asarray(values) * scale
+    result = {f"p{q}": round(float(np.percentile(values, q)), 3) for q in (50, 95, 99)}
+    result["max"] = round(float(values.max()), 3)
+    return result
+
+
+def run(recording, model, speed=0.0, esp32_delay=0.005):
+    """Rejoue `recording` dans la boucle de contrôle et renvoie les métriques."""
+    server = serve(port=0, delay=esp32_delay)
+    source = ReplaySource(recording, speed=speed, fs=BCI_predict.Fs)
+    scheduler = make_scheduler(source, model, clock=source.clock, sleep=source.sleep)
+    dispatcher = CommandDispatcher(f"http://127.0.0.1:{server.server_address[1]}", verbose=False).start()
+    decision_engine = make_decision()
+    metrics = make_metrics(scheduler, dispatcher)
+
+    inference, lags = [], []
+
+    def on_tick(inference_time, command):
+        inference.append(inference_time)
+        lags.append(scheduler.lag)
+
+    start = time.perf_counter()
+    try:
+        scheduler.fill()
+        control_loop(scheduler, model, dispatcher, verbose=False, on_tick=on_tick,
+                     decision_engine=decision_engine, metrics=metrics)
+    except ReplayFinished:
+        pass
+    elapsed = time.perf_counter() - start
+    dispatcher.close()
+    server.shutdown()
+
+    samples = scheduler.buffer.total
+    return {
+        "speed": speed,
+        "samples": samples,
+        "wall_s": round(elapsed, 3),
+        "samples_per_s": round(samples / elapsed, 1),
+        "realtime_factor": round(samples / BCI_predict.Fs / elapsed, 2),
+        "ticks": scheduler.ticks,
+        "dropped_samples": scheduler.dropped,
+        "inference_ms": percentiles(inference),
+        "lag_ms": percentiles(lags),
+        "dispatch_rtt_ms": percentiles([r[1] for r in dispatcher.rtts]),
+        "dispatch_queue_ms": percentiles([r[2] for r in dispatcher.rtts]),
+        "commands_sent": dispatcher.sent,
+        "commands_coalesced": dispatcher.coalesced,
+        "decision": decision_engine.stats(),
+        "stages_ms": {stage: histogram.percentiles() for (name, stage), histogram in metrics.histograms.items()
+                      if name == "stage_seconds"},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Banc d'essai de la boucle BCI en ligne")
+    parser.add_argument("recording")
+    parser.add_argument("--model", default="model/model.pth")
+    parser.add_argument("--backend", default="torchscript", choices=[*BACKENDS, "lda"],
+                        help="lda : --model est un .npz de bandpower.py")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = aussi vite que possible")
+    parser.add_argument("--decision", default=BCI_predict.decision, choices=["raw", "ema", "vote"])
+    parser.add_argument("--esp32-delay", type=float, default=0.005, help="Délai simulé de l'ESP32 (s)")
+    parser.add_argument("--json", default=None, help="Écrire le rapport dans ce fichier")
+    args = parser.parse_args()
+    BCI_predict.decision = args.decision
+
+    if args.backend == "lda":
+        model = BandPowerEngine.load(args.model)
+    else:
+        model = build_engine(args.model, args.backend, parity_recording=args.recording,
+                             decide=BCI_predict.validation_decide, num_threads=BCI_predict.num_threads)
+    report = run(args.recording, model, args.speed, args.esp32_delay)
+    report["backend"] = args.backend
+    report["decision"]["mode"] = args.decision
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
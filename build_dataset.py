@@ -0,0 +1,179 @@
+"""Construit un jeu de données d'entraînement à partir des sessions continues de record_all.
+
+Chaque enregistrement est découpé en segments d'état constant des boutons
+(markers ArduinoMarkers) ; chaque segment donne des fenêtres filtrées + z-score
+étiquetées avec le bouton maintenu. Les enregistrements sont traités en
+parallèle, un par processus, puis regroupés dans un seul dossier :
+
+    windows.npy     (n, channels, n_samples) float32
+    labels.npy      (n,) int64, classes de dataset.LABEL_MAP
+    groups.npy      (n,) int32, indice de l'enregistrement source
+    timestamps.npy  (n,) float64, début de chaque fenêtre
+    meta.json       fichiers sources, paramètres, nombre de fenêtres par classe
+
+    python build_dataset.py recording/ -o data/epochs --workers 8
+    python build_dataset.py recording/ -o data/epochs_05s --n-samples 128 --hop 16
+"""
+import argparse
+import json
+import os
+import time
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from dataset import LABEL_MAP
+from preprocessing import LOWCUT, HIGHCUT, ORDER, bandpass_filter
+from recordings import load_markers, load_recording, sliding_windows, zscore_windows
+
+# Marker0..3 = boutons gauche, droite, haut, bas (keystroke_serialiser.py) ; aucun bouton = stop
+BUTTON_LABELS = ["gauche", "droite", "avant", "arrière"]
+REST_LABEL = "stop"
+
+
+def state_label(state):
+    """Label d'un état des boutons, None si plusieurs boutons sont appuyés."""
+    pressed = np.flatnonzero(state)
+    if len(pressed) == 0:
+        return REST_LABEL
+    if len(pressed) == 1 and pressed[0] < len(BUTTON_LABELS):
+        return BUTTON_LABELS[pressed[0]]
+    return None
+
+
+def segment_recording(path, fs=256, n_samples=256, hop=32, margin=0.25, label_map=LABEL_MAP):
+    """Fenêtres étiquetées d'un enregistrement -> (windows, labels, timestamps).
+
+    Le filtre passe-bande est appliqué (causalement) à tout l'enregistrement avant
+    le découpage, comme en ligne. `margin` secondes sont retirées au début et à la
+    fin de chaque segment : le temps de réaction entre l'intention et le bouton.
+    """
+    timestamps, data = load_recording(path)
+    event_times, event_states = load_markers(path)
+    empty = (np.empty((0, data.shape[1], n_samples), dtype=np.float32), np.empty(0, dtype=np.int64),
+             np.empty(0))
+    if len(event_times) == 0 or len(timestamps) < n_samples:
+        return empty
+
+    filtered = bandpass_filter(data, lowcut=LOWCUT, highcut=HIGHCUT, fs=fs, order=ORDER)
+    # Segment i : [événement i, événement i+1), le dernier va jusqu'à la fin de l'enregistrement
+    ends = np.append(event_times[1:], timestamps[-1] + 1.0 / fs)
+    starts = np.searchsorted(timestamps, event_times + margin)
+    stops = np.searchsorted(timestamps, ends - margin)
+
+    windows, labels, window_times = [], [], []
+    for start, stop, state in zip(starts, stops, event_states):
+        label = state_label(state)
+        if label not in label_map or stop - start < n_samples:
+            continue
+        segment = sliding_windows(filtered[start:stop], n_samples, hop)
+        windows.append(zscore_windows(segment))
+        labels.append(np.full(len(segment), label_map[label], dtype=np.int64))
+        window_times.append(timestamps[start:stop - n_samples + 1:hop])
+    if not windows:
+        return empty
+    return np.concatenate(windows), np.concatenate(labels), np.concatenate(window_times)
+
+
+def recording_files(paths):
+    """Fichiers .csv / .eeg désignés par `paths` (fichiers ou dossiers), triés."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in os.listdir(path) if f.endswith((".csv", ".eeg")))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def build_dataset(paths, output_dir, workers=None, shuffle=True, seed=0, fs=256, n_samples=256, hop=32,
+                  margin=0.25, label_map=LABEL_MAP, verbose=True):
+    """Segmente tous les enregistrements sur `workers` processus et écrit le jeu consolidé.
+
+    Les fenêtres sont écrites directement dans un .npy memory-mappé (jamais deux
+    copies du jeu complet en mémoire) ; avec `shuffle`, dans un ordre aléatoire
+    fixé par `seed` pour pouvoir lire des lots contigus pendant l'entraînement.
+    """
+    files = recording_files(paths)
+    if not files:
+        raise ValueError("Aucun enregistrement trouvé dans %s" % (paths,))
+    workers = workers or cpu_count()
+    segment = partial(segment_recording, fs=fs, n_samples=n_samples, hop=hop, margin=margin, label_map=label_map)
+
+    start = time.perf_counter()
+    results = []
+    with Pool(min(workers, len(files))) as pool:
+        # chunksize=1 : un enregistrement à la fois, les longues sessions ne bloquent pas un lot entier
+        for path, result in zip(files, pool.imap(segment, files, chunksize=1)):
+            results.append(result)
+            if verbose:
+                print("%s: %d fenêtres" % (os.path.basename(path), len(result[0])))
+
+    total = sum(len(labels) for _, labels, _ in results)
+    if total == 0:
+        raise ValueError("Aucune fenêtre étiquetée (les enregistrements ont-ils des markers ?)")
+    n_channels = next(w.shape[1] for w, _, _ in results if len(w))
+
+    order = np.random.default_rng(seed).permutation(total) if shuffle else np.arange(total)
+    os.makedirs(output_dir, exist_ok=True)
+    windows = np.lib.format.open_memmap(os.path.join(output_dir, "windows.npy"), mode="w+",
+                                        dtype=np.float32, shape=(total, n_channels, n_samples))
+    labels = np.empty(total, dtype=np.int64)
+    groups = np.empty(total, dtype=np.int32)
+    timestamps = np.empty(total)
+    offset = 0
+    for group, (w, y, t) in enumerate(results):
+        rows = order[offset:offset + len(y)]
+        windows[rows], labels[rows], groups[rows], timestamps[rows] = w, y, group, t
+        offset += len(y)
+    windows.flush()
+    del windows
+    np.save(os.path.join(output_dir, "labels.npy"), labels)
+    np.save(os.path.join(output_dir, "groups.npy"), groups)
+    np.save(os.path.join(output_dir, "timestamps.npy"), timestamps)
+
+    classes = {name: int((labels == index).sum()) for name, index in label_map.items()}
+    meta = {
+        "files": [os.path.abspath(f) for f in files],
+        "label_map": label_map,
+        "counts": classes,
+        "n_windows": total,
+        "fs": fs, "n_samples": n_samples, "hop": hop, "margin": margin,
+        "lowcut": LOWCUT, "highcut": HIGHCUT, "order": ORDER,
+        "shuffled": shuffle, "seed": seed,
+    }
+    with open(os.path.join(output_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1, ensure_ascii=False)
+
+    if verbose:
+        print("%d fenêtres de %d enregistrements en %.1f s (%d processus) -> %s"
+              % (total, len(files), time.perf_counter() - start, min(workers, len(files)), output_dir))
+        print("Par classe :", classes)
+    return meta
+
+
+def load_dataset(output_dir, mmap=True):
+    """Relit un jeu écrit par `build_dataset` -> (windows, labels, groups, meta)."""
+    with open(os.path.join(output_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    windows = np.load(os.path.join(output_dir, "windows.npy"), mmap_mode="r" if mmap else None)
+    labels = np.load(os.path.join(output_dir, "labels.npy"))
+    groups = np.load(os.path.join(output_dir, "groups.npy"))
+    return windows, labels, groups, meta
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Découpe les sessions record_all en fenêtres étiquetées")
+    parser.add_argument("recordings", nargs="+", help="Fichiers .csv/.eeg ou dossiers")
+    parser.add_argument("-o", "--output", default="data/epochs")
+    parser.add_argument("--workers", type=int, default=None, help="Default: nombre de cœurs")
+    parser.add_argument("--n-samples", type=int, default=256, help="Longueur des fenêtres (256 = 1 s)")
+    parser.add_argument("--hop", type=int, default=32)
+    parser.add_argument("--margin", type=float, default=0.25, help="Secondes retirées autour de chaque appui")
+    parser.add_argument("--no-shuffle", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    build_dataset(args.recordings, args.output, workers=args.workers, shuffle=not args.no_shuffle,
+                  seed=args.seed, n_samples=args.n_samples, hop=args.hop, margin=args.margin)
@@ -0,0 +1,266 @@
+"""Relais de la caméra ESPstream : une seule connexion à l'ESP32, autant de spectateurs que voulu.
+
+L'ESP32-CAM n'envoie ses images JPEG (`webSocket.sendBIN`) qu'à un seul client.
+Le relais garde cette unique connexion et redistribue chaque image à tous les
+abonnés (casque VR, enregistreur, tableau de bord). Chaque abonné a une file
+d'une seule image : si le client est plus lent que la caméra, l'image en
+attente est remplacée par la plus récente (et comptée comme perdue), sans
+jamais ralentir les autres ni accumuler de retard.
+
+Pour que le retard reste borné jusqu'à l'écran, un client qui se connecte avec
+`ack=1` renvoie un message après chaque image affichée : il n'a alors jamais
+plus d'une image en vol (la page du relais le fait). Pour les autres, seul le
+petit tampon d'envoi du noyau (SEND_BUFFER) limite ce qui est en route.
+
+    python camera_relay.py --camera ws://<ip de l'ESP32-CAM>:81 --port 8081
+    # page : http://localhost:8081/   flux : ws://localhost:8081/ws?name=vr&ack=1   mesures : /stats
+"""
+import argparse
+import asyncio
+import json
+import socket
+import struct
+import time
+from collections import deque
+
+from tornado.httpclient import HTTPClientError, HTTPRequest
+from tornado.ioloop import PeriodicCallback
+from tornado.web import Application, RequestHandler
+from tornado.websocket import WebSocketClosedError, WebSocketError, WebSocketHandler, websocket_connect
+
+try:
+    import fcntl
+    import termios
+except ImportError:   # Windows : pas de mesure des octets en attente dans le noyau
+    fcntl = termios = None
+
+# Tampon d'envoi du noyau par spectateur, de l'ordre d'une image QVGA (le noyau le
+# double) : au-delà, les images attendent dans la file d'une image et y sont
+# remplacées au lieu de s'empiler en secondes de retard
+SEND_BUFFER = 8 * 1024
+
+# Page de visualisation : l'image binaire devient directement un Blob, sans base64 octet par octet
+INDEX_HTML = """<html>
+<head>
+<title>Mindbot camera</title>
+<style>
+  body { text-align: center; background: black; margin: 0; }
+  img { width: 100%; max-width: 800px; cursor: pointer; }
+</style>
+</head>
+<body>
+<img id='live' onclick='this.requestFullscreen()'>
+<script>
+var img = document.getElementById('live');
+var socket;
+// Accusé de réception une fois l'image décodée : le relais envoie alors la suivante
+img.onload = img.onerror = function() {
+    if (socket.readyState === WebSocket.OPEN) socket.send('ack');
+};
+function setup() {
+    socket = new WebSocket('ws://' + location.host + '/ws?name=page&ack=1');
+    socket.binaryType = 'blob';
+    socket.onmessage = function(msg) {
+        var previous = img.src;
+        img.src = URL.createObjectURL(msg.data);
+        if (previous) URL.revokeObjectURL(previous);
+    };
+    socket.onclose = function() { setTimeout(setup, 1000); };
+}
+setup();
+</script>
+</body>
+</html>
+"""
+
+
+def queued_bytes(sock):
+    """Octets envoyés mais pas encore acquittés par le client TCP (None si inconnu)."""
+    if fcntl is None or sock is None or sock.fileno() < 0:
+        return None
+    try:
+        return struct.unpack("I", fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, b"\0" * 4))[0]
+    except OSError:
+        return None
+
+
+class Subscriber:
+    """Un spectateur : file d'une image, la plus récente gagne.
+
+    Avec `ack`, l'image suivante n'est envoyée qu'après l'accusé de réception
+    de la précédente (`acknowledge`) : au plus une image en vol.
+    """
+
+    def __init__(self, name, send, ack=False, sock=None):
+        self.name = name
+        self.send = send          # coroutine frame -> None
+        self.ack = ack
+        self.sock = sock
+        self.sent = 0
+        self.dropped = 0
+        self.unacked = 0
+        self._frame = None
+        self._ready = asyncio.Event()
+        self._acked = asyncio.Event()
+        self._acked.set()
+        self._task = asyncio.ensure_future(self._run())
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.dropped += 1     # Le client n'a pas encore pris la précédente
+        self._frame = frame
+        self._ready.set()
+
+    def acknowledge(self):
+        self.unacked = 0
+        self._acked.set()
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            if self.ack:
+                await self._acked.wait()   # Les images arrivées entre-temps se remplacent
+                self._acked.clear()
+                self.unacked = 1
+            self._ready.clear()
+            frame, self._frame = self._frame, None
+            try:
+                await self.send(frame)
+            except WebSocketClosedError:
+                return
+            self.sent += 1
+
+    def close(self):
+        self._task.cancel()
+
+
+class CameraRelay:
+    def __init__(self, camera_url, reconnect_delay=1.0):
+        self.camera_url = camera_url
+        self.reconnect_delay = reconnect_delay
+        self.subscribers = []
+        self.frames = 0
+        self.bytes = 0
+        self.reconnects = 0
+        self.connected = False
+        self.latest = None
+        self._arrivals = deque(maxlen=300)   # Instants des dernières images, pour les fps
+
+    def subscribe(self, name, send, ack=False, sock=None):
+        subscriber = Subscriber(name, send, ack, sock)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def publish(self, frame):
+        self.frames += 1
+        self.bytes += len(frame)
+        self.latest = frame
+        self._arrivals.append(time.monotonic())
+        for subscriber in self.subscribers:
+            subscriber.put(frame)
+
+    @property
+    def fps(self):
+        # Images reçues sur la dernière seconde
+        now = time.monotonic()
+        return sum(1 for t in self._arrivals if now - t <= 1.0)
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "fps": self.fps,
+            "frames": self.frames,
+            "mbytes": round(self.bytes / 1e6, 3),
+            "reconnects": self.reconnects,
+            "clients": [{"name": s.name, "sent": s.sent, "dropped": s.dropped, "ack": s.ack,
+                         "unacked": s.unacked, "queued_bytes": queued_bytes(s.sock)} for s in self.subscribers],
+        }
+
+    async def run(self):
+        """Garde la connexion à la caméra ouverte (reconnexion si l'ESP32 redémarre)."""
+        while True:
+            try:
+                upstream = await websocket_connect(HTTPRequest(self.camera_url, connect_timeout=5.0),
+                                                   max_message_size=4 * 1024 * 1024)
+            except (OSError, asyncio.TimeoutError, HTTPClientError, WebSocketError) as e:
+                # Caméra éteinte, mauvaise URL (404) ou poignée de main refusée : on réessaie
+                print(f"⚠️ Caméra injoignable ({e}), nouvel essai dans {self.reconnect_delay:.0f} s")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            self.connected = True
+            print(f"✅ Connecté à la caméra {self.camera_url}")
+            while True:
+                frame = await upstream.read_message()
+                if frame is None:
+                    break
+                if isinstance(frame, bytes):
+                    self.publish(frame)
+            self.connected = False
+            self.reconnects += 1
+            print("🔄 Caméra déconnectée, reconnexion...")
+            await asyncio.sleep(self.reconnect_delay)
+
+
+class ViewerHandler(WebSocketHandler):
+    def check_origin(self, origin):
+        return True   # Casque VR et tableau de bord servis depuis d'autres origines
+
+    def open(self):
+        relay = self.application.relay
+        name = self.get_argument("name", self.request.remote_ip)
+        ack = self.get_argument("ack", "0") == "1"
+        sock = self.ws_connection.stream.socket
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+        self.subscriber = relay.subscribe(name, lambda frame: self.write_message(frame, binary=True), ack, sock)
+        if relay.latest is not None:
+            self.subscriber.put(relay.latest)   # Image immédiate, sans attendre la suivante
+
+    def on_message(self, message):
+        self.subscriber.acknowledge()   # N'importe quel message du client vaut accusé de réception
+
+    def on_close(self):
+        self.application.relay.unsubscribe(self.subscriber)
+
+
+class IndexHandler(RequestHandler):
+    def get(self):
+        self.write(INDEX_HTML)
+
+
+class StatsHandler(RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(self.application.relay.stats()))
+
+
+def make_app(relay):
+    app = Application([(r"/", IndexHandler), (r"/ws", ViewerHandler), (r"/stats", StatsHandler)])
+    app.relay = relay
+    return app
+
+
+async def main(camera_url, host="0.0.0.0", port=8081, log_interval=10.0):
+    relay = CameraRelay(camera_url)
+    make_app(relay).listen(port, host)
+    print(f"📷 Relais sur http://{host}:{port}/ (flux ws://{host}:{port}/ws)")
+    if log_interval:
+        PeriodicCallback(lambda: print(json.dumps(relay.stats())), log_interval * 1000).start()
+    await relay.run()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Relais WebSocket de la caméra ESPstream")
+    parser.add_argument("--camera", required=True, help="WebSocket de l'ESP32-CAM, ws://<ip>:81")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--log-interval", type=float, default=10.0, help="Secondes entre deux lignes de mesures, 0 pour aucune")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.camera, args.host, args.port, args.log_interval))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CommandDispatcher:
+    """Envoie les commandes à l'ESP32 depuis un thread dédié.
+
+    `send()` ne bloque jamais la boucle EEG : la commande remplace celle en
+    attente (la plus récente gagne) et le thread la transmet sur une session
+    HTTP keep-alive. Les temps aller-retour sont conservés dans `rtts`.
+
+    `on_ack(commande, aller-retour, attente, timestamp)` est appelé (depuis le
+    thread d'envoi) à chaque commande acquittée ; `timestamp` est celui passé à
+    `send`, par exemple l'horodatage LSL de l'échantillon qui l'a déclenchée.
+    """
+
+    def __init__(self, base_url, timeout=1.0, history=1000, verbose=True, on_ack=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.verbose = verbose
+        self.on_ack = on_ack
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.session.mount('http://', adapter)
+
+        self._cond = threading.Condition()
+        self._pending = None      # (commande, instant de la demande, timestamp)
+        self._running = False
+        self._thread = None
+
+        self.rtts = deque(maxlen=history)   # (commande, aller-retour HTTP en s, attente en file en s)
+        self.sent = 0
+        self.coalesced = 0        # Commandes remplacées avant d'être envoyées
+        self.errors = 0
+        self.last_acked = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="CommandDispatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=2.0):
+        """Arrête le thread après l'envoi de la commande en attente."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.session.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send(self, command, timestamp=None):
+        """Met la commande en file sans bloquer (écrase la précédente si non envoyée)."""
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (command, time.perf_counter(), timestamp)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._running:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                command, queued_at, timestamp = self._pending
+                self._pending = None
+            self._post(command, queued_at, timestamp)
+
+    def _post(self, command, queued_at, timestamp=None):
+        url = f"{self.base_url}/{command}"
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            rtt = time.perf_counter() - start
+            if response.status_code == 200:
+                self.sent += 1
+                self.last_acked = command
+                self.rtts.append((command, rtt, start - queued_at))
+                if self.on_ack is not None:
+                    self.on_ack(command, rtt, start - queued_at, timestamp)
+                if self.verbose:
+                    print(f"Commande envoyée : {command} ({rtt * 1000:.1f} ms)")
+            else:
+                self.errors += 1
+                print(f"⚠️ Erreur ESP32 (Code {response.status_code})")
+        except requests.exceptions.RequestException as e:
+            self.errors += 1
+            print(f"🚨 Erreur de connexion à l'ESP32 : {e}")
+
+    def stats(self):
+        rtts = np.array([r[1] for r in self.rtts]) * 1000
+        return {
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "rtt_p50_ms": float(np.percentile(rtts, 50)) if len(rtts) else None,
+            "rtt_p99_ms": float(np.percentile(rtts, 99)) if len(rtts) else None,
+        }
+
+
+# Comparaison requests.get() bloquant / dispatcher, contre le faux ESP32 local
+if __name__ == '__main__':
+    from fake_esp32 import serve
+
+    server = serve(port=0, delay=0.005)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    commands = ["left", "stop", "right", "stop"] * 50
+
+    start = time.perf_counter()
+    for command in commands:
+        requests.get(f"{url}/{command}", timeout=1)
+    blocking = time.perf_counter() - start
+    print(f"requests.get bloquant : {blocking / len(commands) * 1000:.2f} ms par commande dans la boucle")
+
+    with CommandDispatcher(url, verbose=False) as dispatcher:
+        start = time.perf_counter()
+        for command in commands:
+            dispatcher.send(command)
+            time.sleep(0.002)  # ~ une itération de boucle
+        loop_cost = time.perf_counter() - start - 0.002 * len(commands)
+    print(f"Dispatcher : {loop_cost / len(commands) * 1000:.3f} ms par commande dans la boucle")
+    print(dispatcher.stats())
+    server.shutdown()
@@ -0,0 +1,88 @@
+"""EEGNet contre puissances de bandes + LDA : précision et latence sur les mêmes données.
+
+Les deux classifieurs sont entraînés sur les mêmes enregistrements et validés
+sur les mêmes enregistrements mis de côté (train.split_groups). La latence est
+mesurée par pas d'inférence, prétraitement en ligne compris : StreamingPreprocessor
++ EEGNet d'un côté, SlidingBandPower + LDA de l'autre.
+
+    python compare_classifiers.py data/epochs --epochs 20
+    python compare_classifiers.py data/epochs --eegnet model/model.pth   # modèle existant (validation optimiste s'il a vu ces données)
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from bandpower import train_lda
+from inference import InferenceEngine, benchmark, load_eegnet
+from preprocessing import StreamingPreprocessor
+from train import TRAIN_LABELS, load_training_data, split_groups, train
+
+
+def accuracy(engine, windows, labels, batch_size=1024):
+    predictions = np.concatenate([engine.predict_batch(windows[i:i + batch_size]).argmax(axis=1)
+                                  for i in range(0, len(windows), batch_size)])
+    return float((predictions == labels).mean())
+
+
+def step_latency(engine, buffer, hop=32, n_iter=2000, seed=0):
+    """Latence (ms) d'un pas en ligne : `hop` échantillons dans le buffer, fenêtre, prédiction."""
+    n_channels = buffer.n_channels
+    stream = np.random.default_rng(seed).standard_normal((4 * buffer.n_samples, n_channels)).astype(np.float32)
+    buffer.extend(stream)
+    chunk = stream[:hop]
+
+    def step(chunk):
+        buffer.extend(chunk)
+        return engine.predict(buffer.window())
+
+    return benchmark(step, chunk, n_iter)
+
+
+def compare(windows, labels, groups, eegnet_path=None, epochs=20, val_fraction=0.2, seed=0, hop=32, fs=256):
+    val = split_groups(groups, val_fraction, seed)
+    if not val.any():
+        raise ValueError("Il faut au moins deux enregistrements pour valider")
+    n_channels, n_samples = windows.shape[1:]
+    rows = []
+
+    start = time.perf_counter()
+    if eegnet_path:
+        model = load_eegnet(eegnet_path, len(TRAIN_LABELS))
+    else:
+        model, _ = train(windows, labels, groups, epochs=epochs, val_fraction=val_fraction, seed=seed, verbose=False)
+    fit_s = time.perf_counter() - start
+    eegnet = InferenceEngine(model)
+    rows.append({"classifier": "eegnet", "fit_s": fit_s,
+                 "val_accuracy": accuracy(eegnet, windows[val], labels[val]),
+                 **step_latency(eegnet, StreamingPreprocessor(n_channels, n_samples, fs=fs), hop)})
+
+    start = time.perf_counter()
+    lda = train_lda(windows[~val], labels[~val], len(TRAIN_LABELS), fs=fs)
+    fit_s = time.perf_counter() - start
+    rows.append({"classifier": "lda", "fit_s": fit_s,
+                 "val_accuracy": accuracy(lda, windows[val], labels[val]),
+                 **step_latency(lda, lda.feature_buffer(fs), hop)})
+
+    result = pd.DataFrame(rows).set_index("classifier")
+    result["train_windows"], result["val_windows"] = int((~val).sum()), int(val.sum())
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Comparaison EEGNet / LDA sur puissances de bandes")
+    parser.add_argument("data", help="Dossier de build_dataset.py ou de CSV pré-découpés")
+    parser.add_argument("--eegnet", default=None, help="state_dict existant au lieu d'un entraînement")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--val-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hop", type=int, default=32, help="Échantillons par pas d'inférence")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    windows, labels, groups = load_training_data(args.data)
+    result = compare(windows, labels, groups, args.eegnet, args.epochs, args.val_fraction, args.seed, args.hop)
+    print(result.round(4).to_string())
+    if args.output:
+        result.to_csv(args.output)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import Dataset
+
+from preprocessing import LOWCUT, HIGHCUT, ORDER, bandpass_filter
+from recordings import MUSE_CHANNELS, load_recording, sliding_windows, zscore_windows
+
+# Labels du notebook d'entraînement (déduits du nom de fichier : "<label>_<n>.csv")
+LABEL_MAP = {"stop": 0, "avant": 1, "arrière": 2, "gauche": 3, "droite": 4}
+
+CACHE_VERSION = 1
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_signal(path):
+    """Signal (n, channels) d'un enregistrement : canaux du Muse par leur nom.
+
+    Les CSV pré-découpés sans en-têtes TP9/AF7/AF8/TP10 sont lus comme dans le
+    notebook d'entraînement : toutes les colonnes sauf la dernière.
+    """
+    if not path.endswith(".eeg"):
+        columns = pd.read_csv(path, nrows=0).columns
+        if not set(MUSE_CHANNELS) <= set(columns):
+            return pd.read_csv(path).iloc[:, :-1].to_numpy(np.float32)
+    return load_recording(path)[1]
+
+
+def preprocess_recording(path, fs=256, n_samples=256, hop=256, lowcut=LOWCUT, highcut=HIGHCUT, order=ORDER):
+    """Fenêtres prétraitées (n_windows, channels, n_samples) d'un enregistrement.
+
+    Filtrage causal sur tout le fichier puis z-score par fenêtre : exactement ce
+    que voit le modèle en ligne (StreamingPreprocessor).
+    """
+    data = load_signal(path)
+    filtered = bandpass_filter(data, lowcut=lowcut, highcut=highcut, fs=fs, order=order)
+    if len(filtered) < n_samples:
+        return np.empty((0, filtered.shape[1], n_samples), dtype=np.float32)
+    return zscore_windows(sliding_windows(filtered, n_samples, hop))
+
+
+class WindowCache:
+    """Cache disque des fenêtres prétraitées, un .npy par fichier source.
+
+    La clé combine le SHA-256 du fichier et les paramètres de prétraitement : si
+    l'un ou l'autre change, l'entrée est reconstruite et l'ancienne supprimée.
+    Le hash n'est recalculé que si la taille ou la date du fichier ont changé.
+    """
+
+    def __init__(self, cache_dir, **params):
+        self.cache_dir = cache_dir
+        self.params = dict(params, version=CACHE_VERSION)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+
+    def _key(self, path):
+        stat = os.stat(path)
+        entry = dict(self._manifest.get(os.path.abspath(path), {}))
+        if entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime:
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_hash(path)}
+        params = json.dumps(self.params, sort_keys=True)
+        entry["key"] = hashlib.sha256((entry["sha256"] + params).encode()).hexdigest()[:32]
+        return entry
+
+    def get(self, path):
+        """Fenêtres de `path`, memory-mappées depuis le cache (construites si besoin)."""
+        entry = self._key(path)
+        cache_path = os.path.join(self.cache_dir, entry["key"] + ".npy")
+        if not os.path.exists(cache_path):
+            windows = preprocess_recording(path, **{k: v for k, v in self.params.items() if k != "version"})
+            tmp_path = cache_path + ".tmp.npy"
+            np.save(tmp_path, windows)
+            os.replace(tmp_path, cache_path)  # Jamais d'entrée à moitié écrite
+
+        old = self._manifest.get(os.path.abspath(path), {}).get("key")
+        if old and old != entry["key"]:
+            stale = os.path.join(self.cache_dir, old + ".npy")
+            if os.path.exists(stale):
+                os.remove(stale)
+        self._manifest[os.path.abspath(path)] = entry
+        return np.load(cache_path, mmap_mode="r")
+
+    def save_manifest(self):
+        with open(self._manifest_path, "w") as f:
+            json.dump(self._manifest, f, indent=1)
+
+
+class EEGDataset(Dataset):
+    def __init__(self, data_dir, fs=256, n_samples=256, hop=256, label_map=LABEL_MAP, cache_dir=None,
+                 add_dim=0):
+        """Dataset PyTorch des fenêtres EEG prétraitées, servies depuis un cache memory-mappé.
+
+        Différences avec la classe du notebook d'entraînement, pour coller à la
+        chaîne en ligne (StreamingPreprocessor, EEGNet.input_shape) :
+        - tenseurs [1, channels, time] au lieu de [1, time, channels] ;
+        - z-score par fenêtre au lieu d'une normalisation sur tout le fichier ;
+        - canaux choisis par leur nom (TP9, AF7, AF8, TP10), avec repli sur
+          toutes les colonnes sauf la dernière pour les CSV sans ces en-têtes.
+        Un modèle entraîné avec l'ancienne classe n'est donc pas interchangeable.
+
+        Args:
+            data_dir (str): Chemin vers le dossier contenant les enregistrements (CSV ou .eeg).
+            fs (int, optional): Fréquence d'échantillonnage des EEG. Default: 256 Hz.
+            n_samples (int, optional): Longueur d'une fenêtre. Default: 256.
+            hop (int, optional): Pas entre deux fenêtres d'un même fichier. Default: 256.
+            label_map (dict, optional): Label (préfixe du nom de fichier) -> classe.
+            cache_dir (str, optional): Default: "<data_dir>/.cache".
+            add_dim (int, optional): Axe de la dimension ajoutée au tenseur : 0 donne
+                [1, channels, time] (modèle du notebook), -1 [channels, time, 1] (EEGNet.py).
+        """
+        self.data_dir = data_dir
+        self.fs = fs  # Fréquence d'échantillonnage
+        self.add_dim = add_dim
+        self.files = sorted(f for f in os.listdir(data_dir)
+                            if f.endswith((".csv", ".eeg")) and f.split("_")[0] in label_map)
+        self.cache = WindowCache(cache_dir or os.path.join(data_dir, ".cache"),
+                                 fs=fs, n_samples=n_samples, hop=hop, lowcut=LOWCUT, highcut=HIGHCUT, order=ORDER)
+
+        # Un fichier peut contenir plusieurs fenêtres : index global -> (fichier, fenêtre)
+        self.windows = [self.cache.get(os.path.join(data_dir, f)) for f in self.files]
+        self.cache.save_manifest()
+        self.offsets = np.cumsum([0] + [len(w) for w in self.windows])
+        self.file_labels = np.array([label_map[f.split("_")[0]] for f in self.files], dtype=np.int64)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, idx):
+        """Renvoie une fenêtre prétraitée (lue dans le cache) et son label."""
+        file_idx = int(np.searchsorted(self.offsets, idx, side="right")) - 1
+        window = np.array(self.windows[file_idx][idx - self.offsets[file_idx]])
+        eeg_data = torch.from_numpy(window).unsqueeze(self.add_dim)
+        return eeg_data, torch.tensor(self.file_labels[file_idx], dtype=torch.long)
+
+    def labels(self):
+        """Label de chaque fenêtre, dans l'ordre de l'index."""
+        return np.repeat(self.file_labels, np.diff(self.offsets))
@@ -0,0 +1,144 @@
+"""Étage de décision : sorties du modèle fenêtre par fenêtre -> commande de la voiture.
+
+Calibration (softmax), lissage (moyenne exponentielle ou vote majoritaire),
+hystérésis (seuil d'entrée > seuil de sortie) et durée minimale entre deux
+changements. Chaque changement de commande est une requête HTTP et, côté
+voiture, souvent une inversion des moteurs : on en envoie le moins possible,
+et on mesure ce que ça coûte en retard.
+"""
+from collections import deque
+
+import numpy as np
+
+CLASSES = ["left", "right", "stop"]   # Ordre des sorties du modèle
+SMOOTHING = ("ema", "vote", None)
+
+
+def softmax(logits, temperature=1.0):
+    z = np.asarray(logits, dtype=np.float64) / temperature
+    e = np.exp(z - z.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class DecisionEngine:
+    def __init__(
+        self,
+        period,
+        classes=CLASSES,
+        rest="stop",
+        calibrate=True,
+        temperature=1.0,
+        smoothing="ema",
+        alpha=0.3,
+        vote_window=5,
+        enter_threshold=0.7,
+        exit_threshold=0.5,
+        min_dwell=0.25,
+        history=1000,
+    ):
+        """Décision lissée sur le flux de prédictions, une mise à jour par fenêtre.
+
+        Args:
+            period (float): Secondes entre deux prédictions (hop / Fs).
+            calibrate (bool): Softmax (avec `temperature`) sur les sorties brutes ;
+                les seuils sont alors des probabilités.
+            smoothing (str): "ema" (moyenne exponentielle de facteur `alpha`), "vote"
+                (part des `vote_window` dernières fenêtres) ou None.
+            enter_threshold (float | dict): Score lissé au-dessus duquel un mouvement
+                démarre ; un dict donne un seuil par classe.
+            exit_threshold (float | dict, optional): Score en dessous duquel le
+                mouvement en cours s'arrête (hystérésis). None : égal à l'entrée.
+            min_dwell (float): Secondes minimum entre deux changements de commande.
+                Le retour à `rest` n'attend jamais : s'arrêter est toujours sûr.
+            history (int): Nombre de retards de décision gardés pour `stats`.
+
+        Avec calibrate=False, smoothing=None, exit_threshold=None et min_dwell=0,
+        la décision est exactement celle de BCI_predict.decide.
+        """
+        if smoothing not in SMOOTHING:
+            raise ValueError("smoothing doit être l'un de %s" % (SMOOTHING,))
+        self.period = period
+        self.classes = list(classes)
+        self.rest = self.classes.index(rest)
+        self.calibrate = calibrate
+        self.temperature = temperature
+        self.smoothing = smoothing
+        self.alpha = alpha
+        self.enter = self._per_class(enter_threshold)
+        self.exit = self.enter if exit_threshold is None else self._per_class(exit_threshold)
+        self.min_dwell_ticks = int(round(min_dwell / period))
+        self.latencies = deque(maxlen=history)
+        self._votes = deque(maxlen=vote_window)
+        self.reset()
+
+    def _per_class(self, threshold):
+        if isinstance(threshold, dict):
+            return np.array([threshold.get(c, np.inf) for c in self.classes])
+        return np.full(len(self.classes), float(threshold))
+
+    def reset(self):
+        self.current = self.rest
+        self.scores = None
+        self.ticks = 0
+        self.changes = 0
+        self.raw_changes = 0
+        self._votes.clear()
+        self._last_change = -self.min_dwell_ticks
+        self._raw = self.rest
+        self._raw_onset = 0
+
+    def _pick(self, scores, current):
+        # On quitte un mouvement s'il n'est plus en tête ou passe sous le seuil de sortie
+        best = int(scores.argmax())
+        if current != self.rest and best == current and scores[current] > self.exit[current]:
+            return current
+        if best != self.rest and scores[best] > self.enter[best]:
+            return best
+        return self.rest
+
+    def update(self, y_pred):
+        """Sorties (1, num_classes) ou (num_classes,) d'une fenêtre -> commande (str)."""
+        scores = np.asarray(y_pred, dtype=np.float64).reshape(-1)
+        if self.calibrate:
+            scores = softmax(scores, self.temperature)
+
+        # Décision sans lissage, pour mesurer l'agitation et le retard ajouté
+        raw = self._pick(scores, self.rest)
+        if raw != self._raw:
+            self._raw, self._raw_onset = raw, self.ticks
+            self.raw_changes += 1
+
+        if self.smoothing == "ema":
+            self.scores = scores if self.scores is None else self.alpha * scores + (1 - self.alpha) * self.scores
+        elif self.smoothing == "vote":
+            self._votes.append(int(scores.argmax()))
+            self.scores = np.bincount(self._votes, minlength=len(self.classes)) / len(self._votes)
+        else:
+            self.scores = scores
+
+        target = self._pick(self.scores, self.current)
+        if target != self.current and (target == self.rest or
+                                       self.ticks - self._last_change >= self.min_dwell_ticks):
+            if target == self._raw:
+                self.latencies.append((self.ticks - self._raw_onset) * self.period)
+            self.current = target
+            self._last_change = self.ticks
+            self.changes += 1
+        self.ticks += 1
+        return self.classes[self.current]
+
+    def run(self, outputs):
+        """Rejoue un lot de sorties (n, num_classes) dans l'ordre -> commandes (n,)."""
+        return np.array([self.update(y) for y in outputs])
+
+    def stats(self):
+        minutes = self.ticks * self.period / 60
+        latencies = np.asarray(self.latencies) * 1000
+        return {
+            "ticks": self.ticks,
+            "commands": self.changes,
+            "commands_per_min": self.changes / minutes if minutes else 0.0,
+            "raw_changes_per_min": self.raw_changes / minutes if minutes else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        }
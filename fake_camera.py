@@ -0,0 +1,139 @@
+"""Fausse ESP32-CAM (script/ESPstream/ESPstream.ino) pour tester camera_relay.py sans matériel.
+
+Comme le sketch, le serveur WebSocket envoie chaque image JPEG en binaire au
+dernier client connecté seulement :
+
+    python fake_camera.py --port 8181 --fps 25
+    python camera_relay.py --camera ws://127.0.0.1:8181
+    python fake_camera.py --measure --clients 4 --slow 0.2    # relais complet en local
+"""
+import argparse
+import asyncio
+import io
+import json
+import socket
+
+from PIL import Image, ImageDraw
+from tornado.web import Application
+from tornado.websocket import WebSocketClosedError, WebSocketHandler, websocket_connect
+
+from camera_relay import CameraRelay, make_app
+
+
+def make_frames(n=25, size=(320, 240), quality=9):
+    """Images JPEG QVGA numérotées, comme `FRAMESIZE_QVGA` / `jpeg_quality` du sketch."""
+    frames = []
+    for i in range(n):
+        image = Image.new("RGB", size, (40, 40, 40))
+        draw = ImageDraw.Draw(image)
+        x = int(i / n * (size[0] - 40))
+        draw.rectangle([x, 100, x + 40, 140], fill=(200, 60, 60))
+        draw.text((10, 10), "fake ESP32-CAM %d" % i, fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=100 - quality * 5)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+class CameraHandler(WebSocketHandler):
+    def open(self):
+        self.application.client = self   # cam_num = num : seul le dernier client reçoit les images
+
+    def on_close(self):
+        if self.application.client is self:
+            self.application.client = None
+
+
+async def stream_frames(app, fps):
+    frames = make_frames()
+    period = 1.0 / fps
+    loop = asyncio.get_running_loop()
+    next_time = loop.time()
+    i = 0
+    while True:
+        client = app.client
+        if client is not None:
+            try:
+                client.write_message(frames[i % len(frames)], binary=True)
+            except WebSocketClosedError:
+                pass
+            app.sent += 1
+        i += 1
+        next_time += period
+        await asyncio.sleep(max(next_time - loop.time(), 0.0))
+
+
+def serve(port=8181, fps=25.0, host="127.0.0.1"):
+    """Démarre la fausse caméra sur la boucle courante ; renvoie l'application (`app.sent`)."""
+    app = Application([(r"/", CameraHandler)])
+    app.client = None
+    app.sent = 0
+    app.listen(port, host)
+    app.task = asyncio.ensure_future(stream_frames(app, fps))
+    return app
+
+
+async def measure(fps=25.0, clients=3, slow=0.2, duration=5.0, camera_port=8181, relay_port=8081):
+    """Caméra -> relais -> `clients` spectateurs, dont deux qui mettent `slow` s à traiter chaque image.
+
+    "slow" accuse réception de chaque image (ack=1), "slow_noack" non. `in_flight` (envoyées - reçues) donne le retard accumulé.
+    """
+    camera = serve(camera_port, fps)
+    relay = CameraRelay("ws://127.0.0.1:%d/" % camera_port)
+    make_app(relay).listen(relay_port, "127.0.0.1")
+    upstream = asyncio.ensure_future(relay.run())
+    await asyncio.sleep(0.5)
+
+    received = {}
+
+    async def viewer(name, delay, ack=True):
+        connection = await websocket_connect("ws://127.0.0.1:%d/ws?name=%s&ack=%d" % (relay_port, name, ack))
+        if delay:
+            # Petit tampon de réception, comme un client WiFi lent (sinon le loopback absorbe tout)
+            connection.protocol.stream.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        received[name] = 0
+        while True:
+            frame = await connection.read_message()
+            if frame is None:
+                return
+            received[name] += 1
+            if delay:
+                await asyncio.sleep(delay)
+            if ack:
+                await connection.write_message("ack")
+
+    viewers = [asyncio.ensure_future(viewer("viewer%d" % i, 0.0)) for i in range(max(clients - 2, 0))]
+    viewers += [asyncio.ensure_future(viewer("slow", slow)),
+                asyncio.ensure_future(viewer("slow_noack", slow, ack=False))]
+    await asyncio.sleep(duration)
+    stats = relay.stats()
+    stats["camera_sent"] = camera.sent
+    stats["received"] = received
+    for client in stats["clients"]:
+        client["in_flight"] = client["sent"] - received.get(client["name"], 0)
+    for task in viewers + [upstream, camera.task]:
+        task.cancel()
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fausse ESP32-CAM (WebSocket, images JPEG)")
+    parser.add_argument("--port", type=int, default=8181)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--measure", action="store_true", help="Mesurer camera_relay.py en local")
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--slow", type=float, default=0.2, help="Secondes par image du client lent")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(asyncio.run(measure(args.fps, args.clients, args.slow, args.duration, args.port)), indent=2))
+    else:
+        async def run():
+            serve(args.port, args.fps)
+            print(f"📷 Fausse caméra sur ws://127.0.0.1:{args.port}/ ({args.fps:g} images/s)")
+            await asyncio.Event().wait()
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,68 @@
+"""Faux ESP32 (voiture) pour tester sans matériel.
+
+Reproduit les routes HTTP de script/ESPcar/ESPcar.ino. Un délai artificiel
+permet de simuler un WiFi lent :
+
+    python fake_esp32.py --port 8080 --delay 0.02
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTES = {
+    "/forward": "Moving Forward",
+    "/reverse": "Moving Reverse",
+    "/left": "Turning Left",
+    "/right": "Turning Right",
+    "/stop": "Stopping",
+}
+
+
+class ESPcarHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive, comme le WebServer de l'ESP32
+    disable_nagle_algorithm = True  # Évite les 40 ms de delayed ACK entre en-têtes et corps
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        message = ROUTES.get(self.path)
+        if message is None:
+            self.send_error(404)
+            return
+        self.server.commands.append((time.time(), self.path[1:]))
+        body = message.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host="127.0.0.1", port=8080, delay=0.0, verbose=False):
+    """Démarre le serveur dans un thread et le renvoie (`server.commands` liste les commandes reçues)."""
+    server = ThreadingHTTPServer((host, port), ESPcarHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.verbose = verbose
+    server.commands = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Faux ESP32 pour BCI_predict")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--delay", type=float, default=0.0, help="Délai de réponse en secondes")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.delay, verbose=True)
+    print(f"Faux ESP32 sur http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,308 @@
+import copy
+import os
+import pickle
+import tempfile
+import time
+import types
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from EEGNet import EEGNet
+from preprocessing import bandpass_filter
+from recordings import latest_recording, load_recording, sliding_windows, zscore_windows
+
+# Paires (convolution, batch norm) de EEGNet, dans l'ordre du forward
+CONV_BN_PAIRS = [
+    ("conv1", "batch_norm1"),
+    ("depthwise_conv1", "batch_norm2"),
+    ("conv2", "batch_norm3"),
+]
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    # model/model.pth a été picklé depuis un notebook : la classe y est "__main__.EEGNet"
+    def find_class(self, module, name):
+        if module == "__main__" and name == "EEGNet":
+            return EEGNet
+        return super().find_class(module, name)
+
+
+_legacy_pickle = types.SimpleNamespace(__name__="pickle", Unpickler=_LegacyUnpickler, load=pickle.load)
+
+
+def load_state_dict(path):
+    """Charge un state_dict ; accepte aussi un modèle picklé entier (ancien format)."""
+    try:
+        state = torch.load(path, map_location="cpu", weights_only=True)
+    except pickle.UnpicklingError:
+        state = torch.load(path, map_location="cpu", weights_only=False, pickle_module=_legacy_pickle)
+    if isinstance(state, nn.Module):
+        state = state.state_dict()
+    return state
+
+
+def state_input_shape(state):
+    """(canaux, échantillons) d'un state_dict EEGNet.
+
+    Les modèles antérieurs à `EEGNet.input_shape` n'ont pas la clé : la forme est
+    alors déduite des poids (canaux d'entrée de conv1, largeur de fc).
+    """
+    if "input_shape" in state:
+        return tuple(int(v) for v in state["input_shape"])
+    return int(state["conv1.weight"].shape[1]), int(state["fc.weight"].shape[1]) // 16 + 1
+
+
+def input_shape(model):
+    return tuple(int(v) for v in model.input_shape)
+
+
+def load_eegnet(path, num_classes=3):
+    state = load_state_dict(path)
+    n_channels, n_samples = state_input_shape(state)
+    model = EEGNet(num_classes=num_classes, n_channels=n_channels, n_samples=n_samples)
+    if "input_shape" not in state:
+        state = dict(state, input_shape=model.input_shape)
+    model.load_state_dict(state)
+    return model.eval()
+
+
+def fold_batch_norms(model):
+    """Replie chaque BatchNorm dans la convolution qui la précède (copie du modèle)."""
+    model = copy.deepcopy(model).eval()
+    for conv_name, bn_name in CONV_BN_PAIRS:
+        conv, bn = getattr(model, conv_name), getattr(model, bn_name)
+        setattr(model, conv_name, fuse_conv_bn_eval(conv, bn))
+        setattr(model, bn_name, nn.Identity())
+    return model
+
+
+class InferenceEngine:
+    """EEGNet optimisé pour le CPU : BN repliées, TorchScript gelé, inference_mode.
+
+    Appelable comme le modèle d'origine (tensor (N, channels, samples, 1) -> logits).
+    La forme d'entrée est celle déclarée par le modèle (`input_shape`).
+    """
+
+    backend = "torchscript"
+
+    def __init__(self, model, n_channels=None, n_samples=None, num_threads=1, script=True, warmup=20):
+        n_channels, n_samples = n_channels or input_shape(model)[0], n_samples or input_shape(model)[1]
+        self.input_shape = (n_channels, n_samples)
+        torch.set_num_threads(num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Déjà fixé (ne peut l'être qu'une fois par processus)
+
+        self.example = torch.zeros(1, n_channels, n_samples, 1)
+        module = self._prepare(fold_batch_norms(model))
+        if script:
+            with torch.no_grad():
+                module = torch.jit.freeze(torch.jit.trace(module, self.example))
+        self.module = module
+
+        for _ in range(warmup):
+            self(self.example)
+
+    def _prepare(self, model):
+        return model
+
+    @classmethod
+    def from_file(cls, path, num_classes=3, **kwargs):
+        return cls(load_eegnet(path, num_classes), **kwargs)
+
+    def __call__(self, x):
+        with torch.inference_mode():
+            return self.module(x)
+
+    def predict_batch(self, windows):
+        """windows : (N, n_channels, n_samples) -> numpy (N, num_classes)."""
+        x = torch.from_numpy(np.ascontiguousarray(windows, dtype=np.float32))
+        return self(x[..., None]).numpy()
+
+    def predict(self, window):
+        """window : (n_channels, n_samples) -> numpy (1, num_classes)."""
+        return self(torch.from_numpy(window)[None, :, :, None]).numpy()
+
+
+class QuantizedEngine(InferenceEngine):
+    """Comme InferenceEngine, avec `fc`/`out` quantifiées en int8 (quantification dynamique)."""
+
+    backend = "int8"
+
+    def _prepare(self, model):
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEngine:
+    """EEGNet (BN repliées) exporté en ONNX et exécuté par ONNX Runtime sur CPU."""
+
+    backend = "onnx"
+
+    def __init__(self, model, n_channels=None, n_samples=None, num_threads=1, onnx_path=None, warmup=20):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("Le backend 'onnx' nécessite onnxruntime (pip install onnxruntime onnx)")
+
+        n_channels, n_samples = n_channels or input_shape(model)[0], n_samples or input_shape(model)[1]
+        self.input_shape = (n_channels, n_samples)
+        example = torch.zeros(1, n_channels, n_samples, 1)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        # Sans onnx_path, export dans un dossier temporaire supprimé une fois la session chargée
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = onnx_path or os.path.join(tmp_dir, "eegnet.onnx")
+            torch.onnx.export(fold_batch_norms(model), example, path, input_names=["x"],
+                              output_names=["logits"], dynamic_axes={"x": {0: "batch"}, "logits": {0: "batch"}},
+                              dynamo=False)
+            self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.onnx_path = onnx_path
+
+        self.example = example.numpy()
+        for _ in range(warmup):
+            self.session.run(None, {"x": self.example})
+
+    @classmethod
+    def from_file(cls, path, num_classes=3, **kwargs):
+        return cls(load_eegnet(path, num_classes), **kwargs)
+
+    def __call__(self, x):
+        return torch.from_numpy(self.session.run(None, {"x": x.numpy()})[0])
+
+    def predict_batch(self, windows):
+        x = np.ascontiguousarray(windows, dtype=np.float32)[..., np.newaxis]
+        return self.session.run(None, {"x": x})[0]
+
+    def predict(self, window):
+        return self.predict_batch(window[np.newaxis])
+
+
+BACKENDS = {
+    "torchscript": InferenceEngine,
+    "int8": QuantizedEngine,
+    "onnx": OnnxEngine,
+}
+
+
+def check_parity(model, engine, windows, min_agreement=1.0, decide=None, batch_size=256):
+    """Compare un backend au modèle fp32 PyTorch sur des fenêtres (N, channels, samples).
+
+    `decide` transforme un lot de sorties (N, num_classes) en décisions (argmax par
+    défaut). Renvoie le taux d'accord des décisions, l'écart max des sorties et
+    `ok`, vrai si l'accord atteint `min_agreement`.
+    """
+    if decide is None:
+        decide = lambda y: y.argmax(axis=1)
+    model.eval()
+    agree, max_diff = 0, 0.0
+    for start in range(0, len(windows), batch_size):
+        batch = np.ascontiguousarray(windows[start:start + batch_size], dtype=np.float32)
+        with torch.inference_mode():
+            reference = model(torch.from_numpy(batch)[..., None]).numpy()
+        output = engine.predict_batch(batch)
+        agree += int((decide(reference) == decide(output)).sum())
+        max_diff = max(max_diff, float(np.abs(reference - output).max()))
+    agreement = agree / len(windows)
+    return {"agreement": agreement, "max_abs_diff": max_diff, "ok": agreement >= min_agreement}
+
+
+def parity_windows(recording, n_channels=4, n_samples=256, hop=32, fs=256):
+    """Fenêtres prétraitées d'un enregistrement (comme en ligne)."""
+    _, data = load_recording(recording)
+    return zscore_windows(sliding_windows(bandpass_filter(data, fs=fs), n_samples, hop))
+
+
+def build_engine(path, backend="torchscript", parity_recording=None, min_agreement=1.0, decide=None,
+                 num_classes=3, **kwargs):
+    """Construit le backend demandé et le valide contre le modèle fp32.
+
+    Le contrôle porte sur des fenêtres enregistrées : `parity_recording`, ou à
+    défaut le dernier enregistrement de recording/. Sans enregistrement, sans
+    la bibliothèque du backend (onnxruntime) ou si les décisions divergent, le
+    backend est refusé et on repasse sur TorchScript (fp32, décisions
+    identiques) en le signalant.
+    """
+    model = load_eegnet(path, num_classes)
+    if backend == "torchscript":
+        return InferenceEngine(model, **kwargs)
+
+    parity_recording = parity_recording or latest_recording()
+    if parity_recording is None:
+        print(f"🚨 Backend {backend} refusé : aucun enregistrement pour le contrôle de parité, retour à torchscript")
+        return InferenceEngine(model, **kwargs)
+    try:
+        engine = BACKENDS[backend](model, **kwargs)
+    except ImportError as e:   # onnxruntime absent : dépendance optionnelle
+        print(f"🚨 Backend {backend} indisponible ({e}), retour à torchscript")
+        return InferenceEngine(model, **kwargs)
+    windows = parity_windows(parity_recording, *engine.input_shape)
+    report = check_parity(model, engine, windows, min_agreement, decide)
+    print(f"Parité {backend} / fp32 : accord {report['agreement']:.2%}, "
+          f"écart max {report['max_abs_diff']:.2e} sur {len(windows)} fenêtres")
+    if not report["ok"]:
+        print(f"🚨 Backend {backend} refusé (décisions différentes du fp32), retour à torchscript")
+        return InferenceEngine(model, **kwargs)
+    return engine
+
+
+def benchmark(fn, x, n_iter=2000):
+    """Latence par fenêtre en ms : moyenne, p50, p99 et écart-type (gigue)."""
+    timings = np.empty(n_iter)
+    for i in range(n_iter):
+        start = time.perf_counter()
+        fn(x)
+        timings[i] = time.perf_counter() - start
+    timings *= 1000
+    return {
+        "mean_ms": timings.mean(),
+        "p50_ms": np.percentile(timings, 50),
+        "p99_ms": np.percentile(timings, 99),
+        "jitter_ms": timings.std(),
+    }
+
+
+# Micro-benchmark : chemin actuel (modèle eager + no_grad) contre les backends optimisés
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark de l'inférence EEGNet sur CPU")
+    parser.add_argument("--model", default="model/model.pth")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--recording", default=None,
+                        help="Enregistrement pour le contrôle de parité (défaut : le dernier de recording/)")
+    args = parser.parse_args()
+    args.recording = args.recording or latest_recording()
+    if args.recording is None:
+        parser.error("aucun enregistrement pour le contrôle de parité : --recording")
+
+    model = load_eegnet(args.model)
+    windows = parity_windows(args.recording, *input_shape(model))
+    x = torch.from_numpy(windows[:1])[..., None]
+
+    def eager(x):
+        with torch.no_grad():
+            return model(x)
+
+    torch.set_num_threads(args.threads)
+    candidates = [("eager + no_grad", eager)]
+    for name, engine_cls in BACKENDS.items():
+        try:
+            engine = engine_cls(model, num_threads=args.threads)
+        except ImportError as e:
+            print(f"{name}: {e}")
+            continue
+        report = check_parity(model, engine, windows)
+        print(f"Parité {name:12s} accord={report['agreement']:.2%}  écart max={report['max_abs_diff']:.2e}")
+        candidates.append((name, engine))
+
+    for name, fn in candidates:
+        stats = benchmark(fn, x, args.iterations)
+        print(f"{name:16s} " + "  ".join(f"{k}={v:.3f}" for k, v in stats.items()))
@@ -0,0 +1,156 @@
+"""Mesures de la boucle en ligne : temps par étage, retards de bout en bout, compteurs.
+
+Les histogrammes sont cumulatifs à la Prometheus (un `bisect` et deux additions
+par mesure) ; un petit historique sert aux percentiles du journal périodique.
+Export texte Prometheus sur http://127.0.0.1:<port>/metrics :
+
+    curl -s localhost:9108/metrics | grep bci_stage
+"""
+import bisect
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Bornes (s) des histogrammes, de 50 µs (un pull LSL) à 2.5 s (ESP32 injoignable)
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS, history=1000):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # Dernière case : +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=history)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentiles(self, scale=1000):
+        if not self.recent:
+            return {}
+        values = np.asarray(self.recent) * scale
+        return {f"p{q}": round(float(np.percentile(values, q)), 3) for q in (50, 95, 99)}
+
+
+class Metrics:
+    """Registre partagé entre la boucle, le thread du dispatcher et l'endpoint HTTP."""
+
+    def __init__(self, prefix="bci", buckets=BUCKETS, history=1000):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.history = history
+        self.histograms = {}   # (nom, étiquette ou None) -> Histogram
+        self.values = {}       # nom -> (type, valeur) pour les compteurs et jauges
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, stage=None):
+        with self._lock:
+            histogram = self.histograms.get((name, stage))
+            if histogram is None:
+                histogram = self.histograms[(name, stage)] = Histogram(self.buckets, self.history)
+            histogram.observe(value)
+
+    def set(self, name, value, kind="gauge"):
+        # Sous verrou : render() et summary() parcourent ces dicts depuis un autre thread
+        with self._lock:
+            self.values[name] = (kind, value)
+
+    def describe(self, name, text):
+        with self._lock:
+            self.help[name] = text
+
+    def render(self):
+        """Format texte d'exposition Prometheus."""
+        lines = []
+        with self._lock:
+            previous = None
+            ordered = sorted(self.histograms.items(), key=lambda kv: (kv[0][0], kv[0][1] or ""))
+            for (name, stage), histogram in ordered:
+                metric = f"{self.prefix}_{name}"
+                if name != previous:
+                    lines.append(f"# HELP {metric} {self.help.get(name, name)}")
+                    lines.append(f"# TYPE {metric} histogram")
+                    previous = name
+                label = f'stage="{stage}",' if stage is not None else ""
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{metric}_bucket{{{label}le="{le}"}} {cumulative}')
+                label = "{" + label.rstrip(",") + "}" if label else ""
+                lines.append(f"{metric}_sum{label} {histogram.sum:.9f}")
+                lines.append(f"{metric}_count{label} {histogram.count}")
+            values = sorted(self.values.items())
+            descriptions = dict(self.help)
+        for name, (kind, value) in values:
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {descriptions.get(name, name)}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Instantané pour le journal : percentiles (ms) par histogramme, compteurs et jauges."""
+        with self._lock:
+            result = {(f"{name}.{stage}" if stage else name): histogram.percentiles()
+                      for (name, stage), histogram in self.histograms.items()}
+            result.update({name: value for name, (_, value) in self.values.items()})
+        return result
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(metrics, host="127.0.0.1", port=9108):
+    """Endpoint /metrics dans un thread ; renvoie le serveur (`shutdown()` pour l'arrêter)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
+
+
+class MetricsLogger(threading.Thread):
+    """Écrit `metrics.summary()` en une ligne JSON toutes les `interval` secondes."""
+
+    def __init__(self, metrics, interval=10.0, stream=None):
+        super().__init__(name="MetricsLogger", daemon=True)
+        self.metrics = metrics
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self._closed = threading.Event()
+
+    def run(self):
+        while not self._closed.wait(self.interval):
+            self.write()
+
+    def write(self):
+        record = {"time": round(time.time(), 3), **self.metrics.summary()}
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        self._closed.set()
@@ -0,0 +1,165 @@
+"""Rechargement à chaud du modèle, sans arrêter la boucle de contrôle.
+
+`ModelWatcher` s'utilise à la place du moteur d'inférence : il surveille le
+fichier du modèle et, quand il change, charge et préchauffe le nouveau moteur
+dans un thread, le vérifie, puis le substitue à l'ancien. La substitution est
+une simple affectation : chaque `predict` lit le moteur une seule fois, le
+changement a donc toujours lieu entre deux pas.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import parity_windows
+from recordings import latest_recording
+
+
+class ModelWatcher:
+    def __init__(self, path, engine, build, interval=1.0, smoke_recording=None, decide=None, verbose=True):
+        """
+        Args:
+            path (str): Fichier surveillé (state_dict écrit par train.py).
+            engine: Moteur en service (InferenceEngine, OnnxEngine...).
+            build (callable): path -> nouveau moteur, préchauffé (BCI_predict.load_model).
+            interval (float): Secondes entre deux vérifications du fichier.
+            smoke_recording (str, optional): Enregistrement pour le test de fumée ;
+                à défaut le dernier de recording/. Sans enregistrement, pas de
+                rechargement à chaud.
+            decide (callable, optional): Règle de décision, pour comparer les
+                décisions de l'ancien et du nouveau modèle (information seulement).
+        """
+        self.path = path
+        self.engine = engine
+        self.build = build
+        self.interval = interval
+        self.smoke_recording = smoke_recording or latest_recording()
+        self.smoke_windows = None   # Fenêtres du test de fumée, préparées une fois par start()
+        self.decide = decide
+        self.verbose = verbose
+        self.swaps = []        # Un dict par rechargement réussi (durées, accord)
+        self.failures = 0
+        self._signature = self._stat()
+        self._closed = threading.Event()
+        self._thread = None
+
+    # Même interface que les moteurs d'inférence
+    @property
+    def input_shape(self):
+        return self.engine.input_shape
+
+    @property
+    def backend(self):
+        return self.engine.backend
+
+    @property
+    def window_shape(self):
+        return getattr(self.engine, "window_shape", self.engine.input_shape)
+
+    def feature_buffer(self, fs=None):
+        return self.engine.feature_buffer(fs)
+
+    def predict(self, window):
+        return self.engine.predict(window)
+
+    def predict_batch(self, windows):
+        return self.engine.predict_batch(windows)
+
+    def __call__(self, x):
+        return self.engine(x)
+
+    def start(self):
+        if self.smoke_recording is None:
+            # Pas question de mettre en service un modèle testé sur du bruit
+            print("⚠️ Aucun enregistrement pour le test de fumée : rechargement à chaud désactivé")
+            return self
+        self._prepare_smoke_test()
+        self._thread = threading.Thread(target=self._run, name="ModelWatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        candidate = None
+        while not self._closed.wait(self.interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                candidate = None
+                continue
+            # Attendre que le fichier ne bouge plus d'un intervalle à l'autre (copie en cours)
+            if signature != candidate:
+                candidate = signature
+                continue
+            self._signature = signature
+            candidate = None
+            self.reload()
+
+    def _prepare_smoke_test(self):
+        # Lecture et filtrage de l'enregistrement une seule fois, pas à chaque rechargement
+        if self.smoke_windows is None:
+            windows = parity_windows(self.smoke_recording, *self.engine.input_shape)[:256]
+            self.smoke_windows = np.ascontiguousarray(windows)
+        return self.smoke_windows
+
+    def smoke_test(self, engine):
+        """Vérifie le nouveau moteur avant de le mettre en service ; renvoie un rapport."""
+        if tuple(engine.input_shape) != tuple(self.engine.input_shape):
+            return {"ok": False, "reason": "forme d'entrée %s au lieu de %s (buffers dimensionnés au démarrage)"
+                                           % (tuple(engine.input_shape), tuple(self.engine.input_shape))}
+        if engine.backend != self.engine.backend and "lda" in (engine.backend, self.engine.backend):
+            return {"ok": False, "reason": "classifieur %s au lieu de %s (buffer de l'ordonnanceur différent)"
+                                           % (engine.backend, self.engine.backend)}
+        windows = self._prepare_smoke_test()
+        outputs = engine.predict_batch(windows)
+        current = self.engine.predict_batch(windows)
+        if outputs.shape != current.shape:
+            return {"ok": False, "reason": "sorties %s au lieu de %s" % (outputs.shape, current.shape)}
+        if not np.isfinite(outputs).all():
+            return {"ok": False, "reason": "sorties non finies"}
+        decide = self.decide or (lambda y: y.argmax(axis=1))
+        return {"ok": True, "agreement": float((decide(outputs) == decide(current)).mean())}
+
+    def reload(self):
+        """Charge, teste et met en service le modèle du fichier ; False si refusé."""
+        start = time.perf_counter()
+        try:
+            engine = self.build(self.path)
+            loaded = time.perf_counter()
+            report = self.smoke_test(engine)
+        except Exception as e:  # Fichier illisible, poids incompatibles... : on garde l'ancien
+            report = {"ok": False, "reason": repr(e)}
+            loaded = time.perf_counter()
+        tested = time.perf_counter()
+        if not report["ok"]:
+            self.failures += 1
+            print(f"🚨 Nouveau modèle refusé ({report['reason']}), l'ancien reste en service")
+            return False
+
+        swap_start = time.perf_counter()
+        self.engine = engine   # Atomique : le pas en cours finit avec l'ancien moteur
+        swap_end = time.perf_counter()
+        result = {
+            "time": time.time(),
+            "load_s": loaded - start,
+            "smoke_test_s": tested - loaded,
+            "swap_us": (swap_end - swap_start) * 1e6,
+            "agreement": report["agreement"],
+        }
+        self.swaps.append(result)
+        if self.verbose:
+            print(f"🔄 Modèle rechargé : chargement + préchauffage {result['load_s']:.2f} s, "
+                  f"test {result['smoke_test_s'] * 1000:.0f} ms, substitution {result['swap_us']:.1f} µs "
+                  f"(accord avec l'ancien : {result['agreement']:.0%})")
+        return True
@@ -0,0 +1,134 @@
+"""Plusieurs casques, une voiture chacun, un seul processus.
+
+Chaque flux EEG garde son propre buffer (filtré, z-score) et son ordonnanceur ;
+à chaque tour de boucle, les fenêtres prêtes sont empilées et passent dans un
+seul forward batché du modèle, puis chaque décision part vers l'ESP32 du sujet.
+Un seul interpréteur, un seul modèle en mémoire, quel que soit le nombre de
+sujets :
+
+    python multi_predict.py --car Muse-AB12=http://10.1.224.145 --car Muse-CD34=http://10.1.224.146
+    python multi_predict.py --car http://10.1.224.145 --car http://10.1.224.146   # dans l'ordre des flux
+"""
+import argparse
+import time
+
+import numpy as np
+from pylsl import StreamInlet, resolve_byprop
+
+import BCI_predict
+from BCI_predict import make_decision, make_scheduler
+from command_dispatcher import CommandDispatcher
+from model_reload import ModelWatcher
+
+
+class Subject:
+    """Un casque et sa voiture : ordonnanceur, étage de décision et dispatcher HTTP."""
+
+    def __init__(self, name, scheduler, dispatcher, decision_engine):
+        self.name = name
+        self.scheduler = scheduler
+        self.dispatcher = dispatcher
+        self.decision = decision_engine
+        self.last_command = "stop"
+
+
+def assign_cars(streams, cars):
+    """Associe chaque adresse d'ESP32 à un flux : "NOM=URL" (nom ou source_id du flux) ou URL seule.
+
+    Les URL seules sont prises dans l'ordre des flux restants, triés par nom.
+    """
+    streams = sorted(streams, key=lambda s: (s.name(), s.source_id()))
+    assigned, free = [], []
+    for car in cars:
+        key, _, url = car.rpartition("=")
+        if not key:
+            free.append(url)
+            continue
+        match = [s for s in streams if key in (s.name(), s.source_id())]
+        if not match:
+            raise ValueError("Aucun flux EEG nommé '%s'" % key)
+        assigned.append((match[0], url))
+        streams.remove(match[0])
+    if len(free) > len(streams):
+        raise ValueError("Plus de voitures que de flux EEG")
+    return assigned + list(zip(streams, free))
+
+
+def serve_loop(subjects, model, verbose=True, max_ticks=None, sleep=time.sleep):
+    """Boucle commune : fenêtres prêtes -> un forward batché -> une décision par sujet.
+
+    Returns:
+        Nombre de forwards et taille moyenne des lots.
+    """
+    # Fenêtres (channels, samples), ou caractéristiques (channels, bandes) pour la LDA
+    shape = getattr(model, "window_shape", model.input_shape)
+    batch = np.empty((len(subjects), *shape), dtype=np.float32)
+    forwards, windows = 0, 0
+    while max_ticks is None or forwards < max_ticks:
+        ready = []
+        for subject in subjects:
+            window = subject.scheduler.poll()
+            if window is not None:
+                batch[len(ready)] = window  # Copie : le buffer du sujet est réutilisé au pas suivant
+                ready.append(subject)
+        if not ready:
+            # Dormir jusqu'au prochain pas attendu, sur le flux le plus proche
+            sleep(min(s.scheduler.wait_time() for s in subjects))
+            continue
+
+        start = time.perf_counter()
+        y_pred = model.predict_batch(batch[:len(ready)])
+        inference_time = time.perf_counter() - start
+        forwards += 1
+        windows += len(ready)
+
+        for subject, output in zip(ready, y_pred):
+            command = subject.decision.update(output)
+            if command != subject.last_command:
+                subject.dispatcher.send(command, subject.scheduler.sample_time())
+                subject.last_command = command
+            if verbose:
+                print(f"[{subject.name}] {command.upper()} (Confiance : {output.max():.2f}) "
+                      f"| Retard : {subject.scheduler.lag * 1000:.0f} ms, lot de {len(ready)} "
+                      f"en {inference_time * 1000:.2f} ms")
+    return forwards, windows / max(forwards, 1)
+
+
+def main(model, cars, timeout=10.0, verbose=True):
+    print("🔍 Recherche des flux EEG...")
+    streams = resolve_byprop('type', 'EEG', minimum=len(cars), timeout=timeout)
+    pairs = assign_cars(streams, cars)
+
+    subjects = []
+    for info, url in pairs:
+        inlet = StreamInlet(info, max_buflen=BCI_predict.max_buflen)
+        name = info.name() if sum(s.name() == info.name() for s in streams) == 1 else info.source_id()
+        subjects.append(Subject(name, make_scheduler(inlet, model), CommandDispatcher(url, verbose=verbose).start(),
+                                make_decision()))
+        print(f"{name} -> {url}")
+
+    for subject in subjects:
+        subject.scheduler.fill()
+    try:
+        serve_loop(subjects, model, verbose)
+    finally:
+        for subject in subjects:
+            subject.dispatcher.send("stop")  # Ne jamais laisser une voiture rouler
+            subject.dispatcher.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Un processus, plusieurs casques et voitures")
+    parser.add_argument("--car", action="append", required=True,
+                        help="URL de l'ESP32, ou NOM=URL avec le nom / source_id du flux EEG")
+    parser.add_argument("--model", default=None, help="Default: BCI_predict.model_path (ou lda_path)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Attente des flux EEG (s)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    path = args.model or (BCI_predict.lda_path if BCI_predict.classifier == "lda" else BCI_predict.model_path)
+    model = BCI_predict.load_model(path)
+    if BCI_predict.hot_reload:
+        model = ModelWatcher(path, model, BCI_predict.load_model, BCI_predict.reload_interval,
+                             BCI_predict.parity_recording, BCI_predict.validation_decide).start()
+    main(model, args.car, args.timeout, verbose=not args.quiet)
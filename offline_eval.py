@@ -0,0 +1,80 @@
+"""Évaluation hors ligne d'un enregistrement : ce que le modèle aurait décidé à chaque pas.
+
+    python offline_eval.py EEG_recording.csv --hop 32 --output predictions.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+from BCI_predict import decide, make_decision
+from decision import CLASSES, softmax
+from inference import BACKENDS, load_eegnet
+from preprocessing import bandpass_filter
+from recordings import load_recording, sliding_windows, zscore_windows
+
+
+def predict_windows(engine, windows, batch_size=1024, normalize=True):
+    """Sorties (n_windows, num_classes) pour une vue (n_windows, channels, samples), par lots."""
+    outputs = []
+    for start in range(0, len(windows), batch_size):
+        batch = windows[start:start + batch_size]  # Toujours une vue
+        batch = zscore_windows(batch) if normalize else batch
+        outputs.append(engine.predict_batch(batch))
+    return np.concatenate(outputs) if outputs else np.empty((0, len(CLASSES)), np.float32)
+
+
+def evaluate_recording(path, engine, n_samples=None, hop=32, fs=256, preprocess=True, batch_size=1024):
+    """Rejoue un enregistrement fenêtre par fenêtre (pas `hop`) en lots.
+
+    `n_samples` : longueur de fenêtre, celle du modèle par défaut.
+
+    Renvoie un DataFrame : timestamp du dernier échantillon de chaque fenêtre,
+    probabilités (softmax) par classe, sorties brutes, décision brute par fenêtre
+    (`command`) et commande de l'étage de décision lissé (`decision`).
+    """
+    n_samples = n_samples or engine.input_shape[1]
+    timestamps, data = load_recording(path)
+    if preprocess:
+        data = bandpass_filter(data, fs=fs).astype(np.float32)  # Causal : identique au flux en ligne
+    windows = sliding_windows(data, n_samples, hop)
+    logits = predict_windows(engine, windows, batch_size, normalize=preprocess)
+
+    result = pd.DataFrame(softmax(logits), columns=CLASSES)
+    result.insert(0, "timestamps", timestamps[n_samples - 1::hop][:len(result)])
+    for i, name in enumerate(CLASSES):
+        result[f"logit_{name}"] = logits[:, i]
+    result["command"] = decide(logits)
+    result["decision"] = make_decision(period=hop / fs).run(logits)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Évaluation hors ligne d'un enregistrement EEG")
+    parser.add_argument("recording")
+    parser.add_argument("--model", default="model/model.pth")
+    parser.add_argument("--backend", default="torchscript", choices=BACKENDS)
+    parser.add_argument("--hop", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads())
+    parser.add_argument("--raw", action="store_true", help="Sans filtrage ni z-score")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    engine = BACKENDS[args.backend](load_eegnet(args.model), num_threads=args.threads)
+    start = time.perf_counter()
+    result = evaluate_recording(args.recording, engine, hop=args.hop, preprocess=not args.raw,
+                                batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    duration = result["timestamps"].iloc[-1] - result["timestamps"].iloc[0] if len(result) else 0
+    print(f"{len(result)} fenêtres ({duration:.0f} s d'enregistrement) en {elapsed:.2f} s")
+    print(result["decision"].value_counts().to_string())
+    for column in ("command", "decision"):
+        commands = result[column].to_numpy()
+        print(f"Changements ({column}) : {int((commands[1:] != commands[:-1]).sum())}")
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"Prédictions écrites dans {args.output}")
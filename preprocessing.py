@@ -0,0 +1,104 @@
+import numpy as np
+from scipy.signal import butter, lfilter
+
+from ring_buffer import RingBuffer
+
+# Mêmes réglages que EEGNet_Training.ipynb
+LOWCUT = 1.0
+HIGHCUT = 40.0
+ORDER = 5
+
+
+def butter_bandpass(lowcut=LOWCUT, highcut=HIGHCUT, fs=256, order=ORDER):
+    nyquist = 0.5 * fs
+    return butter(order, [lowcut / nyquist, highcut / nyquist], btype='band')
+
+
+# Chemin hors ligne (identique au notebook d'entraînement)
+def bandpass_filter(data, lowcut=LOWCUT, highcut=HIGHCUT, fs=256, order=ORDER):
+    """Applique un filtre passe-bande pour ne garder que les fréquences utiles (1-40 Hz)."""
+    b, a = butter_bandpass(lowcut, highcut, fs, order)
+    return lfilter(b, a, data, axis=0)
+
+
+def normalize_eeg(data):
+    """Normalise les EEG en appliquant un Z-score pour stabiliser les valeurs."""
+    return (data - np.mean(data, axis=0)) / np.std(data, axis=0)
+
+
+def preprocess_eeg(data, fs=256):
+    """Pipeline complet de prétraitement des signaux EEG."""
+    data = bandpass_filter(data, lowcut=LOWCUT, highcut=HIGHCUT, fs=fs)  # Filtrage
+    data = normalize_eeg(data)  # Normalisation
+    return data
+
+
+class StreamingPreprocessor:
+    """Version causale, chunk par chunk, de `preprocess_eeg`.
+
+    Le filtre garde son état (`zi`) d'un chunk à l'autre : le signal filtré est
+    identique à `bandpass_filter` appliqué à tout le flux, sans jamais refiltrer
+    la fenêtre. La moyenne et la variance de la fenêtre sont tenues à jour par
+    sommes glissantes, si bien que `window()` vaut `normalize_eeg` de la fenêtre
+    filtrée. S'utilise à la place d'un `RingBuffer` (même interface).
+    """
+
+    def __init__(self, n_channels, n_samples, fs=256, lowcut=LOWCUT, highcut=HIGHCUT, order=ORDER):
+        self.b, self.a = butter_bandpass(lowcut, highcut, fs, order)
+        self.zi = np.zeros((max(len(self.a), len(self.b)) - 1, n_channels))
+        self.buffer = RingBuffer(n_channels, n_samples)
+        self.n_channels = n_channels
+        self.n_samples = n_samples
+
+        self._sum = np.zeros(n_channels)
+        self._sumsq = np.zeros(n_channels)
+        self._since_refresh = 0
+        self._out = np.empty((n_channels, n_samples), dtype=np.float32)
+
+    @property
+    def full(self):
+        return self.buffer.full
+
+    @property
+    def total(self):
+        return self.buffer.total
+
+    def reset(self):
+        self.zi[:] = 0
+        self.buffer = RingBuffer(self.n_channels, self.n_samples)
+        self._refresh()
+
+    def _refresh(self):
+        # Recalcul exact des sommes pour éviter la dérive numérique
+        window = self.buffer.window().astype(np.float64)
+        self._sum = window.sum(axis=1)
+        self._sumsq = np.einsum('ij,ij->i', window, window)
+        self._since_refresh = 0
+
+    def extend(self, chunk):
+        n = len(chunk)
+        if n == 0:
+            return
+        filtered, self.zi = lfilter(self.b, self.a, chunk, axis=0, zi=self.zi)
+
+        self._since_refresh += n
+        if n >= self.n_samples or self._since_refresh >= self.n_samples:
+            self.buffer.extend(filtered)
+            self._refresh()
+            return
+
+        # Les n plus anciens échantillons sortent de la fenêtre (des zéros tant qu'elle n'est pas pleine)
+        leaving = self.buffer.window()[:, :n]
+        self._sum -= leaving.sum(axis=1)
+        self._sumsq -= np.einsum('ij,ij->i', leaving, leaving)
+        self._sum += filtered.sum(axis=0)
+        self._sumsq += np.einsum('ij,ij->j', filtered, filtered)
+        self.buffer.extend(filtered)
+
+    def window(self):
+        """Fenêtre filtrée et normalisée (z-score par canal), dans un tableau préalloué."""
+        mean = self._sum / self.n_samples
+        std = np.sqrt(np.maximum(self._sumsq / self.n_samples - mean ** 2, 1e-12))
+        np.subtract(self.buffer.window(), mean[:, np.newaxis], out=self._out)
+        self._out /= std[:, np.newaxis]
+        return self._out
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "script"))
+from session_format import SessionFile
+
+# Canaux EEG du Muse (le 5e canal, Right AUX, n'est pas utilisé par le modèle)
+MUSE_CHANNELS = ["TP9", "AF7", "AF8", "TP10"]
+
+
+def recording_channels(columns):
+    """Colonnes de signal d'un CSV muselsl (sans timestamps ni colonnes de markers)."""
+    return [c for c in columns if c != "timestamps" and not c.startswith("Marker")]
+
+
+def channel_names(path):
+    """Canaux de signal d'un enregistrement CSV ou .eeg, sans lire les échantillons."""
+    if path.endswith(".eeg"):
+        return SessionFile(path).channels
+    return recording_channels(pd.read_csv(path, nrows=0).columns)
+
+
+def load_recording(path, channels=MUSE_CHANNELS):
+    """Charge un enregistrement de recorder.py -> (timestamps float64 (n,), data float32 (n, channels)).
+
+    Accepte le CSV comme le format binaire .eeg (lu par memory-map, sans parsing).
+    `channels=None` garde tous les canaux enregistrés (Right AUX compris).
+    """
+    if path.endswith(".eeg"):
+        session = SessionFile(path)
+        timestamps, data = session.samples()
+        if channels is None:
+            channels = session.channels
+        rows = [session.channels.index(c) for c in channels]
+        return timestamps, data[rows].T
+    df = pd.read_csv(path)
+    if channels is None:
+        channels = recording_channels(df.columns)
+    return df["timestamps"].to_numpy(np.float64), df[channels].to_numpy(np.float32)
+
+
+def latest_recording(folder="recording"):
+    """Enregistrement (CSV ou .eeg) le plus récent du dossier de script/main.py, None s'il n'y en a pas."""
+    if not os.path.isdir(folder):
+        return None
+    paths = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith((".csv", ".eeg"))]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def sliding_windows(data, n_samples, hop=1):
+    """Toutes les fenêtres (n_windows, channels, n_samples) d'un signal (n, channels), sans copie."""
+    windows = np.lib.stride_tricks.sliding_window_view(data, n_samples, axis=0)
+    return windows[::hop]
+
+
+def zscore_windows(windows):
+    """`normalize_eeg` appliqué à chaque fenêtre d'un lot (n_windows, channels, n_samples)."""
+    mean = windows.mean(axis=-1, keepdims=True)
+    std = windows.std(axis=-1, keepdims=True)
+    return ((windows - mean) / std).astype(np.float32)
+
+
+def load_markers(path):
+    """Changements d'état des boutons (Marker0..3) -> (timestamps (k,), états (k, n_markers)).
+
+    record_all écrit les markers comme des états maintenus : seules les lignes où
+    l'état change sont gardées. Le premier événement est l'état au début de
+    l'enregistrement. Renvoie des tableaux vides si le fichier n'a pas de markers.
+    """
+    if path.endswith(".eeg"):
+        session = SessionFile(path)
+        if not session.header["n_markers"] or not session.n_samples:
+            return np.empty(0), np.empty((0, session.header["n_markers"]), dtype=np.float32)
+        start, _ = session.samples(0, 1)
+        # Un marker arrivé avant le premier échantillon s'applique dès le début
+        times = np.concatenate([start, np.maximum(session.markers["timestamp"], start[0])])
+        states = np.concatenate([np.zeros((1, session.header["n_markers"]), dtype=np.float32),
+                                 session.markers["values"]])
+    else:
+        columns = pd.read_csv(path, nrows=0).columns
+        marker_columns = [c for c in columns if c.startswith("Marker")]
+        if not marker_columns:
+            return np.empty(0), np.empty((0, 0), dtype=np.float32)
+        df = pd.read_csv(path, usecols=["timestamps"] + marker_columns)
+        times = df["timestamps"].to_numpy(np.float64)
+        states = df[marker_columns].to_numpy(np.float32)
+        if not len(times):
+            return times, states
+
+    changes = np.flatnonzero(np.any(np.diff(states, axis=0, prepend=np.nan) != 0, axis=1))
+    return times[changes], states[changes]
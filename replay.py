@@ -0,0 +1,141 @@
+"""Rejoue un enregistrement comme s'il venait du casque.
+
+Deux modes :
+- `ReplaySource` remplace `StreamInlet` dans le processus (temps réel ou aussi vite
+  que possible grâce à une horloge virtuelle) ;
+- `stream_recording` publie l'enregistrement sur un vrai flux LSL, pour lancer
+  BCI_predict.py tel quel :
+
+    python replay.py EEG_recording.csv --speed 1     # ou une session .eeg
+"""
+import argparse
+import time
+
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet, cf_float32, local_clock
+
+from recordings import channel_names, load_recording
+
+
+class ReplayFinished(Exception):
+    """Levée par `ReplaySource.pull_chunk` quand tout l'enregistrement a été lu."""
+
+
+class _ReplayInfo:
+    # Sous-ensemble de pylsl.StreamInfo utilisé par la chaîne de prédiction
+    def __init__(self, channel_count, srate):
+        self._channel_count = channel_count
+        self._srate = srate
+
+    def channel_count(self):
+        return self._channel_count
+
+    def channel_format(self):
+        return cf_float32
+
+    def nominal_srate(self):
+        return self._srate
+
+    def name(self):
+        return "Replay"
+
+    def type(self):
+        return "EEG"
+
+
+class ReplaySource:
+    """Source en processus qui se comporte comme un `StreamInlet` sur un enregistrement.
+
+    `speed=1` suit le temps réel, `speed=k` va k fois plus vite, `speed=0` va aussi
+    vite que possible : `sleep` avance alors une horloge virtuelle au lieu de dormir.
+    À passer à `make_scheduler(source, clock=source.clock, sleep=source.sleep)`.
+    """
+
+    def __init__(self, path, speed=1.0, fs=256):
+        timestamps, self.data = load_recording(path, channels=None)
+        self.timestamps = timestamps - timestamps[0]  # Horloge de la source : 0 au début
+        self.speed = speed
+        self.position = 0
+        self._info = _ReplayInfo(self.data.shape[1], fs)
+        self._virtual = 0.0
+        self._start = None
+
+    def open_stream(self):
+        self._start = time.perf_counter()
+
+    def clock(self):
+        if self.speed == 0:
+            return self._virtual
+        if self._start is None:
+            self.open_stream()
+        return (time.perf_counter() - self._start) * self.speed
+
+    def sleep(self, seconds):
+        if self.speed == 0:
+            self._virtual += seconds
+        else:
+            time.sleep(seconds / self.speed)
+
+    def info(self):
+        return self._info
+
+    def time_correction(self):
+        return 0.0
+
+    @property
+    def finished(self):
+        return self.position >= len(self.data)
+
+    def pull_chunk(self, timeout=0.0, max_samples=1024, dest_obj=None):
+        available = np.searchsorted(self.timestamps, self.clock(), side="right")
+        if available <= self.position and timeout > 0 and not self.finished:
+            # Attendre le prochain échantillon, sans dépasser le timeout
+            self.sleep(min(timeout, self.timestamps[self.position] - self.clock()))
+            available = np.searchsorted(self.timestamps, self.clock(), side="right")
+
+        n = min(available - self.position, max_samples)
+        if n <= 0:
+            if self.finished:
+                raise ReplayFinished()
+            return (None if dest_obj is not None else []), []
+
+        chunk = self.data[self.position:self.position + n]
+        timestamps = self.timestamps[self.position:self.position + n].tolist()
+        self.position += n
+        if dest_obj is not None:
+            dest_obj[:n] = chunk
+            return None, timestamps
+        return chunk.tolist(), timestamps
+
+
+def stream_recording(path, speed=1.0, chunk_size=12, name="Replay", fs=256):
+    """Publie un enregistrement sur un flux LSL de type EEG, au rythme `speed`."""
+    channels = channel_names(path)
+    timestamps, data = load_recording(path, channels=channels)
+    timestamps = timestamps - timestamps[0]
+
+    info = StreamInfo(name, "EEG", len(channels), fs, "float32", "replay-%s" % name)
+    xml_channels = info.desc().append_child("channels")
+    for label in channels:
+        xml_channels.append_child("channel").append_child_value("label", label)
+    outlet = StreamOutlet(info, chunk_size)
+
+    print(f"Flux LSL '{name}' : {len(data)} échantillons à x{speed}")
+    t0 = local_clock()
+    for start in range(0, len(data), chunk_size):
+        end = min(start + chunk_size, len(data))
+        due = t0 + timestamps[end - 1] / speed
+        delay = due - local_clock()
+        if delay > 0:
+            time.sleep(delay)
+        outlet.push_chunk(data[start:end].tolist(), t0 + timestamps[end - 1] / speed)
+    print("Fin de l'enregistrement")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rejoue un enregistrement sur un flux LSL")
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--name", default="Replay")
+    args = parser.parse_args()
+    stream_recording(args.recording, args.speed, name=args.name)
@@ -0,0 +1,71 @@
+import numpy as np
+from pylsl import cf_double64
+
+# Taille max d'un chunk tiré de LSL en une fois (~0.5 s de Muse à 256 Hz)
+LSL_MAX_CHUNK = 128
+
+
+class RingBuffer:
+    """Buffer circulaire préalloué, float32, organisé par canal (channels, samples).
+
+    Chaque échantillon est écrit deux fois (à `head` et `head + n_samples`) pour
+    que la fenêtre courante soit toujours une tranche continue du tableau :
+    `window()` renvoie une vue, sans copie ni allocation.
+    """
+
+    def __init__(self, n_channels, n_samples, dtype=np.float32):
+        self.n_channels = n_channels
+        self.n_samples = n_samples
+        self._data = np.zeros((n_channels, 2 * n_samples), dtype=dtype)
+        self.head = 0    # Prochaine position d'écriture (= plus ancien échantillon)
+        self.total = 0   # Nombre total d'échantillons reçus
+
+    @property
+    def full(self):
+        return self.total >= self.n_samples
+
+    def extend(self, chunk):
+        """Ajoute un chunk (n, n_channels) au format LSL (échantillon par ligne)."""
+        n = len(chunk)
+        if n == 0:
+            return
+        N = self.n_samples
+        if n > N:
+            # Seuls les N derniers échantillons survivent
+            self.total += n - N
+            chunk = chunk[-N:]
+            n = N
+
+        first = min(n, N - self.head)
+        head = self.head
+        self._data[:, head:head + first] = chunk[:first].T
+        self._data[:, head + N:head + N + first] = chunk[:first].T
+        rest = n - first
+        if rest:
+            self._data[:, :rest] = chunk[first:].T
+            self._data[:, N:N + rest] = chunk[first:].T
+
+        self.head = (head + n) % N
+        self.total += n
+
+    def window(self):
+        """Vue (n_channels, n_samples) du plus ancien au plus récent échantillon."""
+        return self._data[:, self.head:self.head + self.n_samples]
+
+
+class InletReader:
+    """Tire des chunks d'un StreamInlet dans un tableau préalloué (pas de listes Python)."""
+
+    def __init__(self, inlet, max_samples=LSL_MAX_CHUNK):
+        info = inlet.info()
+        dtype = np.float64 if info.channel_format() == cf_double64 else np.float32
+        self.inlet = inlet
+        self.channel_count = info.channel_count()
+        self.max_samples = max_samples
+        self._chunk = np.empty((max_samples, self.channel_count), dtype=dtype)
+
+    def pull(self, timeout=0.0):
+        """Renvoie (data, timestamps) ; `data` est une vue sur le buffer interne."""
+        _, timestamps = self.inlet.pull_chunk(
+            timeout=timeout, max_samples=self.max_samples, dest_obj=self._chunk)
+        return self._chunk[:len(timestamps)], timestamps
@@ -0,0 +1,121 @@
+import time
+from pylsl import local_clock
+
+
+class InferenceScheduler:
+    """Cadence l'inférence tous les `hop` échantillons sur la fenêtre la plus récente.
+
+    À chaque tick, tout ce qui attend dans l'inlet LSL est vidé dans le buffer
+    circulaire : seule la fenêtre la plus récente est évaluée, les pas
+    intermédiaires sont abandonnés (et comptés) au lieu de s'accumuler. Le retard
+    reste donc borné quelle que soit la durée de la session.
+    """
+
+    def __init__(self, reader, buffer, fs, hop=32, correction_interval=5.0, clock=local_clock, sleep=time.sleep):
+        # `clock`/`sleep` sont remplaçables pour rejouer un enregistrement plus vite que le temps réel
+        self.clock = clock
+        self.sleep = sleep
+        self.reader = reader
+        self.buffer = buffer
+        self.fs = fs
+        self.hop = hop
+        self.correction_interval = correction_interval
+
+        self.pending = 0          # Échantillons reçus depuis la dernière fenêtre
+        self.dropped = 0          # Échantillons dont le pas d'inférence a été sauté
+        self.ticks = 0
+        self.last_timestamp = None
+        self.lag = 0.0            # Retard (s) du dernier échantillon par rapport à l'horloge locale
+        self._time_correction = 0.0
+        self._last_correction = None
+        # Temps (s) passé dans chaque étage pour la dernière fenêtre, hors attente
+        self.timings = {"pull": 0.0, "extend": 0.0, "window": 0.0}
+
+    def _drain(self):
+        """Vide l'inlet sans bloquer ; renvoie le nombre d'échantillons lus."""
+        received = 0
+        timings = self.timings
+        while True:
+            start = time.perf_counter()
+            chunk, timestamps = self.reader.pull()
+            pulled = time.perf_counter()
+            timings["pull"] += pulled - start
+            n = len(timestamps)
+            if n == 0:
+                break
+            self.buffer.extend(chunk[:, :self.buffer.n_channels])
+            timings["extend"] += time.perf_counter() - pulled
+            self.last_timestamp = timestamps[-1]
+            received += n
+            if n < self.reader.max_samples:
+                break
+        self.pending += received
+        return received
+
+    def _update_lag(self):
+        now = self.clock()
+        if self._last_correction is None or now - self._last_correction > self.correction_interval:
+            self._time_correction = self.reader.inlet.time_correction()
+            self._last_correction = now
+        if self.last_timestamp is not None:
+            self.lag = now - (self.last_timestamp + self._time_correction)
+
+    def sample_time(self):
+        """Horodatage du dernier échantillon reçu, ramené à l'horloge locale (time_correction)."""
+        if self.last_timestamp is None:
+            return None
+        return self.last_timestamp + self._time_correction
+
+    def fill(self):
+        """Bloque jusqu'à ce que le buffer contienne une fenêtre complète."""
+        while not self.buffer.full:
+            if self._drain() == 0:
+                self.sleep(self.hop / self.fs)
+        self.pending = 0
+
+    def next_window(self):
+        """Attend `hop` nouveaux échantillons puis renvoie la fenêtre la plus récente."""
+        for stage in self.timings:
+            self.timings[stage] = 0.0
+        self._drain()
+        while self.pending < self.hop:
+            # Dormir le temps théorique d'arrivée des échantillons manquants
+            self.sleep((self.hop - self.pending) / self.fs)
+            self._drain()
+
+        return self._tick()
+
+    def poll(self):
+        """Version non bloquante de `next_window` : None tant que `hop` échantillons ne sont pas arrivés.
+
+        Permet de servir plusieurs flux depuis une seule boucle (voir multi_predict.py).
+        """
+        for stage in self.timings:
+            self.timings[stage] = 0.0
+        self._drain()
+        if not self.buffer.full or self.pending < self.hop:
+            return None
+        return self._tick()
+
+    def wait_time(self):
+        """Secondes avant l'arrivée théorique des échantillons manquants pour le prochain pas."""
+        return max(self.hop - self.pending, 0) / self.fs
+
+    def _tick(self):
+        # Au-delà d'un pas, les fenêtres intermédiaires sont périmées : on les saute
+        self.dropped += self.pending - self.hop
+        self.pending = 0
+        self.ticks += 1
+        self._update_lag()
+        start = time.perf_counter()
+        window = self.buffer.window()
+        self.timings["window"] = time.perf_counter() - start
+        return window
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "received": self.buffer.total,
+            "dropped": self.dropped,
+            "lag_ms": self.lag * 1000,
+        }
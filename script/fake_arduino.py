@@ -0,0 +1,122 @@
+"""Faux Arduino (arduino_controller.ino) sur un pseudo-terminal, pour tester le pont sans carte.
+
+    python fake_arduino.py --rate 200                 # affiche le port à passer à keystroke_serialiser.py
+    python fake_arduino.py --measure --rate 1000      # débit et erreur de datation du pont
+
+Comme le sketch, une ligne "b1,b2,b3,b4" n'est écrite que quand l'état change
+(`--rate` changements par seconde, tirés au hasard). Linux / macOS uniquement.
+"""
+import argparse
+import os
+import threading
+import time
+import tty
+
+import numpy as np
+import serial
+from pylsl import local_clock
+
+from keystroke_serialiser import N_BUTTONS, MarkerBridge
+
+
+class FakeArduino(threading.Thread):
+    def __init__(self, rate=100.0, duration=None, seed=0):
+        super().__init__(name="FakeArduino", daemon=True)
+        self.rate = rate
+        self.duration = duration
+        self.rng = np.random.default_rng(seed)
+        self.master, slave = os.openpty()
+        tty.setraw(slave)  # Pas d'écho ni de conversion des fins de ligne
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self.sent = []   # (timestamp LSL d'écriture, état)
+        self._closed = threading.Event()
+
+    def run(self):
+        state = np.zeros(N_BUTTONS, dtype=np.int32)
+        start = local_clock()
+        n = 0
+        while not self._closed.is_set():
+            if self.duration is not None and local_clock() - start >= self.duration:
+                break
+            n += 1
+            delay = start + n / self.rate - local_clock()
+            if delay > 0:
+                time.sleep(delay)
+            # Un seul bouton à la fois, comme un appui réel
+            pressed = self.rng.integers(-1, N_BUTTONS)
+            new = np.zeros(N_BUTTONS, dtype=np.int32)
+            if pressed >= 0:
+                new[pressed] = 1
+            if np.array_equal(new, state):
+                continue
+            state = new
+            os.write(self.master, (",".join(map(str, state)) + "\r\n").encode())
+            self.sent.append((local_clock(), state))
+
+    def close(self):
+        self._closed.set()
+        self.join()
+        os.close(self.master)
+        os.close(self._slave)
+
+
+class _Recorder:
+    # Remplace StreamOutlet : garde ce qui aurait été publié
+    def __init__(self):
+        self.samples, self.timestamps = [], []
+
+    def push_chunk(self, samples, timestamps):
+        self.samples.extend(samples)
+        self.timestamps.extend(timestamps)
+
+
+def measure(rate=1000.0, duration=5.0):
+    """Fait tourner le pont sur le faux Arduino ; renvoie débit et erreur de datation (ms)."""
+    arduino = FakeArduino(rate, duration)
+    ser = serial.Serial(arduino.port, timeout=0.1)
+    outlet = _Recorder()
+    bridge = MarkerBridge(ser, outlet, verbose=False, byte_time=0.0)  # Pas de débit série sur un pty
+    stop = threading.Event()
+    reader = threading.Thread(target=bridge.run, args=(stop,), daemon=True)
+    reader.start()
+    arduino.start()
+    arduino.join()
+    time.sleep(0.2)
+    stop.set()
+    reader.join()
+    ser.close()
+    arduino.close()
+
+    sent = np.array([t for t, _ in arduino.sent])
+    received = np.array(outlet.timestamps)
+    n = min(len(sent), len(received))
+    errors = (received[:n] - sent[:n]) * 1000
+    return {
+        "changes_sent": len(sent),
+        "changes_published": len(received),
+        "states_match": bool(np.array_equal(np.array([s for _, s in arduino.sent[:n]]), np.array(outlet.samples[:n]))),
+        "changes_per_s": len(received) / duration,
+        "error_ms_p50": float(np.percentile(errors, 50)) if n else None,
+        "error_ms_p99": float(np.percentile(errors, 99)) if n else None,
+        "jitter_ms": float(errors.std()) if n else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Faux Arduino sur pseudo-terminal")
+    parser.add_argument("--rate", type=float, default=100.0, help="Changements d'état par seconde")
+    parser.add_argument("--duration", type=float, default=None)
+    parser.add_argument("--measure", action="store_true", help="Mesurer le pont keystroke_serialiser")
+    args = parser.parse_args()
+
+    if args.measure:
+        print(measure(args.rate, args.duration or 5.0))
+    else:
+        arduino = FakeArduino(args.rate, args.duration)
+        print("Faux Arduino sur", arduino.port)
+        arduino.start()
+        try:
+            arduino.join()
+        except KeyboardInterrupt:
+            pass
@@ -1,35 +1,165 @@
+import argparse
+import queue
+import threading
+
+import numpy as np
 import serial
-import time
-from pynput.keyboard import Controller, Key
-from pylsl import StreamInfo, StreamOutlet
-
-# Création du flux LSL avec 4 canaux (1 par touche)
-info = StreamInfo('ArduinoMarkers', 'Markers', 4, 0, 'int32', 'arduino123')
-outlet = StreamOutlet(info)
-
-# Connexion série avec l'Arduino
-ser = serial.Serial('COM5', 9600) # Trouver un moyen de détecter automatiquement le port
-keyboard = Controller()
-
-while True:
-    line = ser.readline().decode().strip()
-    if line:
-        # Convertir directement en tableau d'entiers
-        boutons = list(map(int, line.split(',')))
-        
-        # Assigner les valeurs
-        left, right, up, down = boutons  # Décomposition du tableau
-        timestamp = time.time()  # Capture du temps UNIX
-        
-        # Simule la pression des touches
-        keyboard.press(Key.left) if left else keyboard.release(Key.left)
-        keyboard.press(Key.right) if right else keyboard.release(Key.right)
-        keyboard.press(Key.up) if up else keyboard.release(Key.up)
-        keyboard.press(Key.down) if down else keyboard.release(Key.down)
-
-        # Envoi des 4 valeurs dans le flux LSL
-        outlet.push_sample(boutons, timestamp)
-        print(boutons, timestamp) # Affichage pour le débogage
-
-# Might be usefull to rewrite this script into 2 functions: 
-# with and without the LSL stream
+from serial.tools import list_ports
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+# Boutons de arduino_controller.ino, dans l'ordre des colonnes (Marker0..3)
+N_BUTTONS = 4
+# VID USB des cartes Arduino et des convertisseurs série des clones (CH340, FTDI, CP210x)
+ARDUINO_VIDS = {0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4}
+
+
+def find_arduino_port():
+    """Premier port série qui ressemble à un Arduino, None si aucun."""
+    for port in list_ports.comports():
+        description = (port.description or "") + (port.manufacturer or "")
+        if port.vid in ARDUINO_VIDS or "Arduino" in description or "CH340" in description:
+            return port.device
+    return None
+
+
+def parse_lines(data, byte_time=0.0, t_read=0.0):
+    """Lignes complètes "b1,b2,b3,b4\\n" d'un bloc lu -> (états (n, 4), timestamps (n,), reste).
+
+    Le timestamp de chaque ligne est l'instant de lecture moins le temps de
+    transmission des octets reçus après elle (`byte_time` par octet) : une
+    lecture groupée ne donne pas le même instant à toutes les lignes du bloc.
+    """
+    end = data.rfind(b"\n")
+    if end < 0:
+        return np.empty((0, N_BUTTONS), dtype=np.int32), np.empty(0), data
+    lines = data[:end].split(b"\n")
+    ends = np.cumsum([len(line) + 1 for line in lines]) - 1   # Position de chaque "\n"
+    timestamps = t_read - (len(data) - 1 - ends) * byte_time
+    try:
+        # Chemin rapide : tout le bloc d'un coup
+        states = np.array(b",".join(lines).split(b","), dtype=np.int32).reshape(-1, N_BUTTONS)
+    except ValueError:
+        # Ligne tronquée (ouverture du port en cours de transmission) : on l'ignore
+        keep, rows = [], []
+        for i, line in enumerate(lines):
+            values = line.strip().split(b",")
+            if len(values) == N_BUTTONS and all(v.strip().isdigit() for v in values):
+                keep.append(i)
+                rows.append([int(v) for v in values])
+        states = np.array(rows, dtype=np.int32).reshape(-1, N_BUTTONS)
+        timestamps = timestamps[keep]
+    return states, timestamps, data[end + 1:]
+
+
+class KeyboardEmulator(threading.Thread):
+    """Simule les flèches du clavier depuis son propre thread (pynput est lent)."""
+
+    def __init__(self):
+        super().__init__(name="KeyboardEmulator", daemon=True)
+        from pynput.keyboard import Controller, Key  # Nécessite un affichage : importé seulement si utilisé
+        self.keyboard = Controller()
+        self.keys = [Key.left, Key.right, Key.up, Key.down]
+        self.queue = queue.Queue()
+        self.state = np.zeros(N_BUTTONS, dtype=np.int32)
+
+    def run(self):
+        while True:
+            state = self.queue.get()
+            if state is None:
+                return
+            for key, before, after in zip(self.keys, self.state, state):
+                if after and not before:
+                    self.keyboard.press(key)
+                elif before and not after:
+                    self.keyboard.release(key)
+            self.state = state
+
+    def close(self):
+        self.queue.put(None)
+
+
+class MarkerBridge:
+    """Lit l'Arduino par blocs et publie les changements d'état sur le flux LSL 'ArduinoMarkers'.
+
+    Args:
+        ser: Port série ouvert (ou tout objet avec `read` et `in_waiting`).
+        outlet: StreamOutlet de 4 canaux int32.
+        keyboard (bool): Simuler aussi les flèches du clavier.
+        byte_time (float, optional): Durée d'un octet sur la liaison (10 bits par
+            octet : 10 / baudrate par défaut), pour dater chaque ligne d'un bloc.
+    """
+
+    def __init__(self, ser, outlet, keyboard=False, verbose=True, byte_time=None):
+        self.ser = ser
+        self.outlet = outlet
+        self.verbose = verbose
+        self.byte_time = 10.0 / ser.baudrate if byte_time is None else byte_time
+        self.keyboard = KeyboardEmulator() if keyboard else None
+        self.state = np.zeros(N_BUTTONS, dtype=np.int32)
+        self.lines = 0
+        self.changes = 0
+        self._rest = b""
+
+    def process(self, data, t_read):
+        """Traite un bloc lu à l'instant `t_read` (horloge LSL) ; publie les changements."""
+        states, timestamps, self._rest = parse_lines(self._rest + data, self.byte_time, t_read)
+        self.lines += len(states)
+        if len(states) == 0:
+            return states, timestamps
+        # Seules les lignes qui changent l'état sont publiées
+        previous = np.vstack([self.state, states[:-1]])
+        changed = np.any(states != previous, axis=1)
+        states, timestamps = states[changed], timestamps[changed]
+        if len(states):
+            self.outlet.push_chunk(states.tolist(), timestamps.tolist())
+            self.state = states[-1]
+            self.changes += len(states)
+            if self.keyboard is not None:
+                self.keyboard.queue.put(self.state.copy())
+            if self.verbose:
+                for state, timestamp in zip(states, timestamps):
+                    print(state.tolist(), "%.4f" % timestamp)
+        return states, timestamps
+
+    def run(self, stop_event=None):
+        if self.keyboard is not None:
+            self.keyboard.start()
+        try:
+            while stop_event is None or not stop_event.is_set():
+                # Bloque jusqu'au premier octet (ou timeout), puis prend tout ce qui attend
+                data = self.ser.read(1)
+                if not data:
+                    continue
+                data += self.ser.read(self.ser.in_waiting)
+                self.process(data, local_clock())
+        finally:
+            if self.keyboard is not None:
+                self.keyboard.close()
+
+
+def open_outlet():
+    # Création du flux LSL avec 4 canaux (1 par touche)
+    info = StreamInfo('ArduinoMarkers', 'Markers', N_BUTTONS, 0, 'int32', 'arduino123')
+    return StreamOutlet(info)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pont Arduino (boutons) -> flux LSL ArduinoMarkers")
+    parser.add_argument("--port", default=None, help="Port série (détecté automatiquement par défaut)")
+    parser.add_argument("--baud", type=int, default=9600, help="Doit correspondre à Serial.begin() du sketch")
+    parser.add_argument("--keyboard", action="store_true", help="Simuler aussi les flèches du clavier")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    port = args.port or find_arduino_port()
+    if port is None:
+        raise SystemExit("Aucun Arduino détecté, préciser --port")
+    print("Arduino sur", port)
+
+    # Connexion série avec l'Arduino
+    ser = serial.Serial(port, args.baud, timeout=0.5)
+    bridge = MarkerBridge(ser, open_outlet(), keyboard=args.keyboard, verbose=not args.quiet)
+    try:
+        bridge.run()
+    except KeyboardInterrupt:
+        print("%d lignes lues, %d changements publiés" % (bridge.lines, bridge.changes))
@@ -1,8 +1,17 @@
 import os
+import sys
 import time
 import muselsl as msl
 from multiprocessing import Process, Event
 from recorder import record_muse, record_all
+from orchestrator import Supervisor, stream_ready
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared_ring import run_acquisition, wait_for_ring
+
+# The headset is received once, into this shared ring; recordings read it and
+# BCI_predict.py can too (shared_ring = RING_NAME), so both see the same samples
+RING_NAME = "mindbot_eeg"
 
 def stream(address):
     msl.stream(address)
@@ -10,6 +19,17 @@ def stream(address):
 def view(version):
     msl.view(version=version)
 
+def start_recording(target, stop_event, filename, save_frequence=5, duration=None):
+    # Returns once the recorder has found the stream and started its readers
+    ready_event = Event()
+    record_process = Process(target=target, args=(stop_event, filename, save_frequence),
+                             kwargs=dict(duration=duration, ready_event=ready_event, ring=RING_NAME))
+    record_process.start()
+    while not ready_event.wait(0.1):
+        if not record_process.is_alive():
+            break
+    return record_process
+
 def record_menu(filename):
     # Recording selection
     print("1. Record EEG until stopped")
@@ -21,9 +41,7 @@ def record_menu(filename):
 
     if record_mode == "1" :
         # record until stopped
-        record_process = Process(target=record_muse, args=(stop_event, filename))
-        record_process.start()
-        time.sleep(5) # This is here only to allow the next print to be visible
+        record_process = start_recording(record_muse, stop_event, filename)
 
         # Wait for user input to stop recording
         input("Press Enter to stop recording...")
@@ -39,16 +57,12 @@ def record_menu(filename):
         except ValueError as e:
             print(f"Invalid input: {e}, recording aborted")
             return
-        record_process = Process(target=record_muse, args=(stop_event,filename, 1))
-        record_process.start()
-        time.sleep(record_time + 2)
-        stop_event.set()
+        # The recorder stops by itself after record_time seconds of samples
+        record_process = start_recording(record_muse, stop_event, filename, 1, duration=record_time)
         record_process.join()
     elif record_mode == "3" :
         # record until stopped
-        record_process = Process(target=record_muse, args=(stop_event, filename, 1))
-        record_process.start()
-        time.sleep(5) # This is here only to allow the next print to be visible
+        record_process = start_recording(record_all, stop_event, filename, 1)
 
         # Wait for user input to stop recording
         input("Press Enter to stop recording...")
@@ -71,26 +85,28 @@ def setup():
     address = muses[0]["address"]
     print(f"Device address: {address}")
 
-    # Start the stream process
-    stream_process = Process(target=stream, args=(address,))
-    stream_process.start()
-    time.sleep(12) # Wait for the stream to start
-
-    # Start the viewer process
-    view_process = Process(target=view, args=(2,))
-    view_process.start()
-    time.sleep(5) # Wait for the viewer to start
+    # The stream is ready once its first chunk arrives, and restarted if the Muse disconnects
+    supervisor = Supervisor()
+    supervisor.add("stream", stream, (address,), ready=stream_ready("EEG"))
+    supervisor.add("ring", run_acquisition, (RING_NAME,),
+                   ready=lambda timeout, alive: wait_for_ring(RING_NAME, timeout, alive))
+    supervisor.add("viewer", view, (2,), restart=False)  # Closing the window is allowed
+    try:
+        supervisor.start()
+    except RuntimeError as e:
+        print(e)
+        return
 
     # record file to the correct folder
     data_folder = os.path.join(os.getcwd(), "recording")
     filename = os.path.join(data_folder, "%s_recording_%s.csv" %("EEG",time.strftime('%Y-%m-%d-%H.%M.%S', time.localtime())))
 
     # Record the data
-    record_menu(filename)
-
-    # end all processes
-    view_process.terminate()
-    stream_process.terminate()
+    try:
+        record_menu(filename)
+    finally:
+        # end all processes
+        supervisor.close()
 
 if __name__ == "__main__":
     setup()
\ No newline at end of file
@@ -0,0 +1,162 @@
+# Starts and supervises the child processes of a recording session
+#
+# Instead of sleeping a fixed time after each start, a child is ready when its
+# readiness check passes (for the Muse stream: the LSL stream resolves and
+# delivers its first chunk). A watch thread restarts children that exit on
+# their own; inlets opened on a restarted stream recover by themselves since
+# the stream keeps its source_id.
+
+import threading
+from multiprocessing import Process
+from time import monotonic
+
+from pylsl import StreamInlet, resolve_byprop
+
+
+def wait_for_stream(stream_type="EEG", timeout=30.0, alive=None, poll=0.5):
+    """Waits until a stream of this type resolves and delivers a first chunk.
+
+    Args:
+        stream_type (str): LSL stream type to look for.
+        timeout (float): Seconds before giving up.
+        alive (callable, optional): Returns False when the process supposed to
+            create the stream has died, to give up without waiting the timeout.
+        poll (float): Longest single LSL call, so `alive` is checked often.
+
+    Returns:
+        The StreamInfo, or None on timeout or if the producer died.
+    """
+    deadline = monotonic() + timeout
+    streams = []
+    while not streams:
+        if monotonic() >= deadline or (alive is not None and not alive()):
+            return None
+        streams = resolve_byprop('type', stream_type, timeout=min(poll, max(deadline - monotonic(), 0.0)))
+
+    inlet = StreamInlet(streams[0])
+    try:
+        while monotonic() < deadline:
+            if alive is not None and not alive():
+                return None
+            _, timestamps = inlet.pull_chunk(timeout=poll)
+            if timestamps:
+                return streams[0]
+        return None
+    finally:
+        inlet.close_stream()
+
+
+def stream_ready(stream_type="EEG"):
+    """Readiness check for `Supervisor.add`: the stream delivers data."""
+    def ready(timeout, alive):
+        return wait_for_stream(stream_type, timeout, alive) is not None
+    return ready
+
+
+class Child:
+    def __init__(self, name, target, args=(), ready=None, ready_timeout=30.0, restart=True):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.ready = ready
+        self.ready_timeout = ready_timeout
+        self.restart = restart
+        self.process = None
+        self.restarts = 0
+        self.ready_time = None  # Seconds from the last start to readiness
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    """Child processes started in order, each one only once the previous is ready.
+
+        supervisor = Supervisor()
+        supervisor.add("stream", stream, (address,), ready=stream_ready("EEG"))
+        supervisor.add("viewer", view, (2,))
+        with supervisor:
+            ...
+    """
+
+    def __init__(self, max_restarts=3, poll_interval=0.5, verbose=True):
+        self.children = []
+        self.max_restarts = max_restarts
+        self.poll_interval = poll_interval
+        self.verbose = verbose
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._watch = None
+
+    def add(self, name, target, args=(), ready=None, ready_timeout=30.0, restart=True):
+        """Declares a child.
+
+        Args:
+            ready (callable, optional): `ready(timeout, alive) -> bool`, blocks until
+                the child is usable. Without it the child is ready once started.
+            restart (bool): Restart the child when it exits on its own.
+        """
+        child = Child(name, target, args, ready, ready_timeout, restart)
+        self.children.append(child)
+        return child
+
+    def __getitem__(self, name):
+        return next(child for child in self.children if child.name == name)
+
+    def start(self):
+        """Starts every child in order; raises RuntimeError if one never gets ready."""
+        for child in self.children:
+            if not self._launch(child):
+                self.close()
+                raise RuntimeError("%s did not get ready within %.0f s" % (child.name, child.ready_timeout))
+        self._watch = threading.Thread(target=self._run, name="Supervisor", daemon=True)
+        self._watch.start()
+        return self
+
+    def _launch(self, child):
+        with self._lock:
+            if self._closed.is_set():
+                return False
+            child.process = Process(target=child.target, args=child.args, name=child.name)
+            child.process.start()
+        start = monotonic()
+        alive = lambda: child.alive() and not self._closed.is_set()
+        if child.ready is not None and not child.ready(child.ready_timeout, alive):
+            return False
+        child.ready_time = monotonic() - start
+        if self.verbose:
+            print("%s ready in %.1f s" % (child.name, child.ready_time))
+        return True
+
+    def _run(self):
+        while not self._closed.wait(self.poll_interval):
+            for child in self.children:
+                if child.alive() or not child.restart or self._closed.is_set():
+                    continue
+                if child.restarts >= self.max_restarts:
+                    continue
+                child.restarts += 1
+                print("%s exited (code %s), restarting (%d/%d)" %
+                      (child.name, child.process.exitcode, child.restarts, self.max_restarts))
+                self._launch(child)
+
+    def close(self, timeout=5.0):
+        """Stops the watch thread, then the children in reverse order."""
+        with self._lock:
+            self._closed.set()
+        if self._watch is not None:
+            self._watch.join()
+        for child in reversed(self.children):
+            if child.process is None:
+                continue
+            child.process.terminate()
+            child.process.join(timeout)
+            if child.process.is_alive():
+                child.process.kill()
+                child.process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
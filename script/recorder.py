@@ -1,213 +1,256 @@
 # This file is a modified version of the original file from the muselsl library
 
+import bisect
 import os
+import sys
+import threading
 from pylsl import StreamInlet, resolve_byprop
 from time import time, strftime, gmtime
 from muselsl.constants import LSL_SCAN_TIMEOUT, LSL_EEG_CHUNK, LSL_PPG_CHUNK, LSL_ACC_CHUNK, LSL_GYRO_CHUNK
-from muselsl.record import _save
+from session_writer import IncrementalWriter
+from session_format import SessionFileWriter
 from multiprocessing import Event
 
-DEFAULT_MARKER = [0, 0, 0, 0]
-
-def record_muse(
-    stop_event: Event,
-    filename=None,
-    save_frequence=5,
-    dejitter=False,
-    continuous: bool = True,
-) -> None:
-    chunk_length = LSL_EEG_CHUNK
-
-    if not filename:
-        filename = os.path.join(os.getcwd(), "EEG_recording_%s.csv" % (strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from shared_ring import RingInlet
 
-    print("Looking for a EEG stream...")
-    streams = resolve_byprop('type', 'EEG', timeout=LSL_SCAN_TIMEOUT)
-
-    if len(streams) == 0:
-        print("Can't find EEG stream.")
-        return
+DEFAULT_MARKER = [0, 0, 0, 0]
 
-    print("Started acquiring data.")
-    inlet = StreamInlet(streams[0], max_chunklen=chunk_length)
+CHUNK_LENGTHS = {
+    "EEG": LSL_EEG_CHUNK,
+    "PPG": LSL_PPG_CHUNK,
+    "ACC": LSL_ACC_CHUNK,
+    "GYRO": LSL_GYRO_CHUNK,
+}
+MARKER_CHUNK = 32
+TIME_CORRECTION_INTERVAL = 5.0
+# Extra wall-clock time allowed to a timed recording before giving up on a stalled stream
+STALL_TIMEOUT = 5.0
 
-    info = inlet.info()
-    description = info.desc()
+#region [acquisition engine]
 
+def _channel_names(info):
     Nchan = info.channel_count()
 
-    ch = description.child('channels').first_child()
+    ch = info.desc().child('channels').first_child()
     ch_names = [ch.child_value('label')]
     for i in range(1, Nchan):
         ch = ch.next_sibling()
         ch_names.append(ch.child_value('label'))
+    return ch_names
+
+class StreamReader(threading.Thread):
+    """Pulls chunks from one inlet on its own thread.
+
+    Timestamps are converted to the local LSL clock with the inlet's time
+    correction (refreshed every few seconds) before being handed to `on_chunk`,
+    so every stream of a session shares the same time base.
+
+    With a `duration`, the reader stops on the sample clock: the first sample
+    starts it, samples stamped `duration` seconds later or more are dropped and
+    `finished` is set, so a timed recording holds exactly duration * srate samples.
+    """
+
+    def __init__(self, name, inlet, chunk_length, on_chunk, stop_event, duration=None):
+        super().__init__(name=name, daemon=True)
+        self.inlet = inlet
+        self.chunk_length = chunk_length
+        self.on_chunk = on_chunk
+        self.stop_event = stop_event
+        self.duration = duration
+        self.time_correction = inlet.time_correction()
+        self.samples = 0
+        self.first_timestamp = None
+        self.finished = threading.Event()
+
+    def run(self):
+        last_correction = time()
+        while not self.stop_event.is_set():
+            data, timestamps = self.inlet.pull_chunk(timeout=0.2, max_samples=self.chunk_length)
+            if not timestamps:
+                continue
+            if time() - last_correction > TIME_CORRECTION_INTERVAL:
+                self.time_correction = self.inlet.time_correction()
+                last_correction = time()
+            timestamps = [t + self.time_correction for t in timestamps]
+            if self.duration is not None:
+                if self.first_timestamp is None:
+                    self.first_timestamp = timestamps[0]
+                end = bisect.bisect_left(timestamps, self.first_timestamp + self.duration)
+                if end < len(timestamps):
+                    data, timestamps = data[:end], timestamps[:end]
+                    self.finished.set()
+            if timestamps:
+                self.samples += len(timestamps)
+                self.on_chunk(data, timestamps)
+            if self.finished.is_set():
+                return
+
+def acquire(
+    stop_event,
+    filename=None,
+    sources=("EEG",),
+    marker_name=None,
+    hold_markers=False,
+    save_frequence=5,
+    dejitter=False,
+    continuous: bool = True,
+    duration=None,
+    ready_event=None,
+    ring=None,
+) -> None:
+    """Records any number of LSL streams concurrently, one reader thread per stream.
+
+    Args:
+        stop_event: Event that ends the recording (checked even with a duration).
+        filename (str, optional): File of the first source, CSV or binary session
+            if it ends with ".eeg". Every other source is written next to it,
+            suffixed with its type.
+        sources (tuple): Stream types to record ("EEG", "PPG", "ACC", "GYRO").
+            The first one is required, the others are skipped if not found.
+        marker_name (str, optional): Name of a Markers stream whose samples are
+            merged into the first source's file on the corrected timestamps.
+        hold_markers (bool): Markers are button states, see IncrementalWriter.
+        duration (float, optional): Stop after this many seconds of the first
+            source, counted on its sample timestamps.
+        ready_event (optional): Event set once every reader has started.
+        ring (str, optional): Shared ring (shared_ring.py) to read the first source
+            from instead of opening a second inlet on the headset, so the file holds
+            exactly the samples the predictor reading the same ring sees.
+    """
+    primary = sources[0]
+    if not filename:
+        filename = os.path.join(os.getcwd(), "%s_recording_%s.csv" %
+                                (primary, strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
+
+    inlets = []
+    for source in sources:
+        if ring and source == primary:
+            print("Reading %s from shared ring '%s'" % (source, ring))
+            inlets.append((source, RingInlet(ring), CHUNK_LENGTHS.get(source, LSL_EEG_CHUNK)))
+            continue
+        print("Looking for a %s stream..." % (source))
+        streams = resolve_byprop('type', source, timeout=LSL_SCAN_TIMEOUT)
+
+        if len(streams) == 0:
+            print("Can't find %s stream." % (source))
+            if source == primary:
+                return
+            continue
+
+        chunk_length = CHUNK_LENGTHS.get(source, LSL_EEG_CHUNK)
+        inlets.append((source, StreamInlet(streams[0], max_chunklen=chunk_length), chunk_length))
+
+    inlet_marker = None
+    if marker_name:
+        print("Looking for a Markers stream...")
+        marker_streams = resolve_byprop('name', marker_name, timeout=LSL_SCAN_TIMEOUT)
+
+        if marker_streams:
+            print("Found %s stream" % marker_name, marker_streams)
+            inlet_marker = StreamInlet(marker_streams[0])
+            inlet_marker.open_stream()  # Ouvre explicitement le flux
+        else:
+            print("Can't find Markers stream.")
+
+    base, extension = os.path.splitext(filename)
+    binary = extension == ".eeg"
+
+    stop_readers = threading.Event()
+    readers = []
+    writers = []
+    for source, inlet, chunk_length in inlets:
+        is_primary = source == primary
+        options = dict(
+            n_markers=inlet_marker.info().channel_count() if (is_primary and inlet_marker) else 0,
+            flush_interval=save_frequence if continuous else 60,
+            dejitter=dejitter,
+        )
+        source_filename = filename if is_primary else "%s_%s%s" % (base, source, extension)
+        if binary:
+            writer = SessionFileWriter(source_filename, _channel_names(inlet.info()),
+                                       srate=inlet.info().nominal_srate(), **options)
+        else:
+            writer = IncrementalWriter(source_filename, _channel_names(inlet.info()),
+                                       hold_markers=hold_markers, **options)
+        writers.append(writer)
+        readers.append(StreamReader(source, inlet, chunk_length, writer.write, stop_readers,
+                                    duration=duration if is_primary else None))
+
+    if inlet_marker:
+        primary_writer = writers[0]
+
+        def on_markers(markers, timestamps):
+            for marker, timestamp in zip(markers, timestamps):
+                primary_writer.write_marker(marker, timestamp)
+
+        readers.append(StreamReader("Markers", inlet_marker, MARKER_CHUNK, on_markers, stop_readers))
 
-    inlet_marker = False
-    markers = []
-    res = []
-    timestamps = []
+    print("Started acquiring data.")
     t_init = time()
-    time_correction = inlet.time_correction()
-    last_written_timestamp = None
     print('Start recording at time t=%.3f' % t_init)
-    print('Time correction: ', time_correction)
-    
-    while not stop_event.is_set():  # Check the stop event
-        try:
-            data, timestamp = inlet.pull_chunk(
-                timeout=1.0, max_samples=chunk_length)
-
-            if timestamp:
-                res.append(data)
-                timestamps.extend(timestamp)
-                tr = time()
-
-            # Save every save_frequence
-            if continuous and (last_written_timestamp is None or last_written_timestamp + save_frequence < timestamps[-1]):
-                _save(
-                    filename,
-                    res,
-                    timestamps,
-                    time_correction,
-                    dejitter,
-                    inlet_marker,
-                    markers,
-                    ch_names,
-                    last_written_timestamp=last_written_timestamp,
-                )
-                last_written_timestamp = timestamps[-1]
-
-        except KeyboardInterrupt:
-            break
-
-    time_correction = inlet.time_correction()
-    print("Time correction: ", time_correction)
-
-    _save(
-        filename,
-        res,
-        timestamps,
-        time_correction,
-        dejitter,
-        inlet_marker,
-        markers,
-        ch_names,
-    )
-
-    print("Done - wrote file: {}".format(filename))
+    for reader in readers:
+        print('Time correction (%s): ' % reader.name, reader.time_correction)
+        reader.start()
+    if ready_event is not None:
+        ready_event.set()
+
+    primary_reader = readers[0]
+    try:
+        while not stop_event.is_set():
+            if primary_reader.finished.wait(0.1):
+                break
+            if duration is not None and time() - t_init >= duration + STALL_TIMEOUT:
+                print("%s stream stalled, recording stopped early." % primary)
+                break
+    except KeyboardInterrupt:
+        pass
+
+    stop_readers.set()
+    for reader in readers:
+        reader.join()
+        print("%s: %d samples" % (reader.name, reader.samples))
+    for writer in writers:
+        writer.close()
+        print("Done - wrote file: {}".format(writer.filename))
 
-# def record_inputs ?
+#endregion
 
-def record_all(
+def record_muse(
     stop_event: Event,
     filename=None,
     save_frequence=5,
     dejitter=False,
     continuous: bool = True,
+    duration=None,
+    ready_event=None,
+    ring=None,
 ) -> None:
-    chunk_length = LSL_EEG_CHUNK
-
     if not filename:
         filename = os.path.join(os.getcwd(), "EEG_recording_%s.csv" % (strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
 
-    print("Looking for a EEG stream...")
-    streams = resolve_byprop('type', 'EEG', timeout=LSL_SCAN_TIMEOUT)
-
-    if len(streams) == 0:
-        print("Can't find EEG stream.")
-        return
+    acquire(stop_event, filename, ("EEG",), save_frequence=save_frequence, dejitter=dejitter, continuous=continuous,
+            duration=duration, ready_event=ready_event, ring=ring)
 
-    print("Started acquiring data.")
-    inlet = StreamInlet(streams[0], max_chunklen=chunk_length)
-
-    print("Looking for a Markers stream...")
-    marker_streams = resolve_byprop('name', 'ArduinoMarkers', timeout=LSL_SCAN_TIMEOUT)
-
-    if marker_streams:
-        print("Found ArduinoMarkers stream", marker_streams)
-        inlet_marker = StreamInlet(marker_streams[0])
-        inlet_marker.open_stream()  # Ouvre explicitement le flux
-    else:
-        inlet_marker = False
-        print("Can't find Markers stream.")
-
-    info = inlet.info()
-    description = info.desc()
-
-    Nchan = info.channel_count()
+# def record_inputs ?
 
-    ch = description.child('channels').first_child()
-    ch_names = [ch.child_value('label')]
-    for i in range(1, Nchan):
-        ch = ch.next_sibling()
-        ch_names.append(ch.child_value('label'))
+def record_all(
+    stop_event: Event,
+    filename=None,
+    save_frequence=5,
+    dejitter=False,
+    continuous: bool = True,
+    duration=None,
+    ready_event=None,
+    ring=None,
+) -> None:
+    if not filename:
+        filename = os.path.join(os.getcwd(), "EEG_recording_%s.csv" % (strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
 
-    res = []
-    timestamps = []
-    markers = []
-    last_marker = DEFAULT_MARKER
-    t_init = time()
-    time_correction = inlet.time_correction()
-    last_written_timestamp = None
-    print('Start recording at time t=%.3f' % t_init)
-    print('Time correction: ', time_correction)
-    
-    while not stop_event.is_set():  # Check the stop event
-        try:
-            data, timestamp = inlet.pull_chunk(
-                timeout=1.0, max_samples=chunk_length)
-
-            if timestamp:
-                res.append(data)
-                timestamps.extend(timestamp)
-                tr = time()           
-                  
-            if inlet_marker:
-                marker, timestamp = inlet_marker.pull_sample(timeout=0.1)
-                print(f"Marker: {last_marker} - Timestamp: {time()}") # Debug
-                
-                if marker is not None:  
-                    last_marker = marker
-                
-                if timestamp is None:
-                    timestamp = time()
-                
-                markers.append([last_marker, timestamp]) # Save with the last marker value
-
-            # Save every save_frequence
-            if continuous and (last_written_timestamp is None or last_written_timestamp + save_frequence < timestamps[-1]):
-                print(f"Type de marker: {type(marker)} - Valeur: {marker}") # Debug
-                _save(
-                    filename,
-                    res,
-                    timestamps,
-                    time_correction,
-                    dejitter,
-                    inlet_marker,
-                    markers,
-                    ch_names,
-                    last_written_timestamp=last_written_timestamp,
-                )
-                last_written_timestamp = timestamps[-1]
-
-        except KeyboardInterrupt:
-            break
-
-    time_correction = inlet.time_correction()
-    print("Time correction: ", time_correction)
-
-    _save(
-        filename,
-        res,
-        timestamps,
-        time_correction,
-        dejitter,
-        inlet_marker,
-        markers,
-        ch_names,
-    )
-
-    print("Done - wrote file: {}".format(filename))
+    # Button states are held until the next change
+    acquire(stop_event, filename, ("EEG",), marker_name='ArduinoMarkers', hold_markers=True,
+            save_frequence=save_frequence, dejitter=dejitter, continuous=continuous,
+            duration=duration, ready_event=ready_event, ring=ring)
 
 #region [legacy functions]
 
@@ -219,106 +262,8 @@ def record_for(
     data_source="EEG",
     continuous: bool = True,
 ) -> None:
-    chunk_length = LSL_EEG_CHUNK
-    if data_source == "PPG":
-        chunk_length = LSL_PPG_CHUNK
-    if data_source == "ACC":
-        chunk_length = LSL_ACC_CHUNK
-    if data_source == "GYRO":
-        chunk_length = LSL_GYRO_CHUNK
-
-    if not filename:
-        filename = os.path.join(os.getcwd(), "%s_recording_%s.csv" %
-                                (data_source,
-                                 strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
-
-    print("Looking for a %s stream..." % (data_source))
-    streams = resolve_byprop('type', data_source, timeout=LSL_SCAN_TIMEOUT)
-
-    if len(streams) == 0:
-        print("Can't find %s stream." % (data_source))
-        return
-
-    print("Started acquiring data.")
-    inlet = StreamInlet(streams[0], max_chunklen=chunk_length)
-    # eeg_time_correction = inlet.time_correction()
-
-    print("Looking for a Markers stream...")
-    marker_streams = resolve_byprop(
-        'name', 'Markers', timeout=LSL_SCAN_TIMEOUT)
-
-    if marker_streams:
-        inlet_marker = StreamInlet(marker_streams[0])
-    else:
-        inlet_marker = False
-        print("Can't find Markers stream.")
-
-    info = inlet.info()
-    description = info.desc()
-
-    Nchan = info.channel_count()
-
-    ch = description.child('channels').first_child()
-    ch_names = [ch.child_value('label')]
-    for i in range(1, Nchan):
-        ch = ch.next_sibling()
-        ch_names.append(ch.child_value('label'))
-
-    res = []
-    timestamps = []
-    markers = []
-    t_init = time()
-    time_correction = inlet.time_correction()
-    last_written_timestamp = None
-    print('Start recording at time t=%.3f' % t_init)
-    print('Time correction: ', time_correction)
-    while (time() - t_init) < duration:
-        try:
-            data, timestamp = inlet.pull_chunk(
-                timeout=1.0, max_samples=chunk_length)
-
-            if timestamp:
-                res.append(data)
-                timestamps.extend(timestamp)
-                tr = time()
-            if inlet_marker:
-                marker, timestamp = inlet_marker.pull_sample(timeout=0.0)
-                if timestamp:
-                    markers.append([marker, timestamp])
-
-            # Save every save_frequence
-            if continuous and (last_written_timestamp is None or last_written_timestamp + save_frequence < timestamps[-1]):
-                _save(
-                    filename,
-                    res,
-                    timestamps,
-                    time_correction,
-                    dejitter,
-                    inlet_marker,
-                    markers,
-                    ch_names,
-                    last_written_timestamp=last_written_timestamp,
-                )
-                last_written_timestamp = timestamps[-1]
-
-        except KeyboardInterrupt:
-            break
-
-    time_correction = inlet.time_correction()
-    print("Time correction: ", time_correction)
-
-    _save(
-        filename,
-        res,
-        timestamps,
-        time_correction,
-        dejitter,
-        inlet_marker,
-        markers,
-        ch_names,
-    )
-
-    print("Done - wrote file: {}".format(filename))
+    acquire(Event(), filename, (data_source,), marker_name='Markers', save_frequence=save_frequence,
+            dejitter=dejitter, continuous=continuous, duration=duration)
 
 def record_until(
     stop_event: Event,
@@ -328,105 +273,7 @@ def record_until(
     data_source="EEG",
     continuous: bool = True,
 ) -> None:
-    chunk_length = LSL_EEG_CHUNK
-    if data_source == "PPG":
-        chunk_length = LSL_PPG_CHUNK
-    if data_source == "ACC":
-        chunk_length = LSL_ACC_CHUNK
-    if data_source == "GYRO":
-        chunk_length = LSL_GYRO_CHUNK
-
-    if not filename:
-        filename = os.path.join(os.getcwd(), "%s_recording_%s.csv" %
-                                (data_source,
-                                 strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
-
-    print("Looking for a %s stream..." % (data_source))
-    streams = resolve_byprop('type', data_source, timeout=LSL_SCAN_TIMEOUT)
-
-    if len(streams) == 0:
-        print("Can't find %s stream." % (data_source))
-        return
-
-    print("Started acquiring data.")
-    inlet = StreamInlet(streams[0], max_chunklen=chunk_length)
-
-    print("Looking for a Markers stream...")
-    marker_streams = resolve_byprop(
-        'name', 'Markers', timeout=LSL_SCAN_TIMEOUT)
-
-    if marker_streams:
-        inlet_marker = StreamInlet(marker_streams[0])
-    else:
-        inlet_marker = False
-        print("Can't find Markers stream.")
-
-    info = inlet.info()
-    description = info.desc()
-
-    Nchan = info.channel_count()
-
-    ch = description.child('channels').first_child()
-    ch_names = [ch.child_value('label')]
-    for i in range(1, Nchan):
-        ch = ch.next_sibling()
-        ch_names.append(ch.child_value('label'))
-
-    res = []
-    timestamps = []
-    markers = []
-    t_init = time()
-    time_correction = inlet.time_correction()
-    last_written_timestamp = None
-    print('Start recording at time t=%.3f' % t_init)
-    print('Time correction: ', time_correction)
-    
-    while not stop_event.is_set():  # Check the stop event
-        try:
-            data, timestamp = inlet.pull_chunk(
-                timeout=1.0, max_samples=chunk_length)
-
-            if timestamp:
-                res.append(data)
-                timestamps.extend(timestamp)
-                tr = time()
-            if inlet_marker:
-                marker, timestamp = inlet_marker.pull_sample(timeout=0.0)
-                if timestamp:
-                    markers.append([marker, timestamp])
-
-            # Save every save_frequence
-            if continuous and (last_written_timestamp is None or last_written_timestamp + save_frequence < timestamps[-1]):
-                _save(
-                    filename,
-                    res,
-                    timestamps,
-                    time_correction,
-                    dejitter,
-                    inlet_marker,
-                    markers,
-                    ch_names,
-                    last_written_timestamp=last_written_timestamp,
-                )
-                last_written_timestamp = timestamps[-1]
-
-        except KeyboardInterrupt:
-            break
-
-    time_correction = inlet.time_correction()
-    print("Time correction: ", time_correction)
-
-    _save(
-        filename,
-        res,
-        timestamps,
-        time_correction,
-        dejitter,
-        inlet_marker,
-        markers,
-        ch_names,
-    )
-
-    print("Done - wrote file: {}".format(filename))
+    acquire(stop_event, filename, (data_source,), marker_name='Markers', save_frequence=save_frequence,
+            dejitter=dejitter, continuous=continuous)
 
 #endregion
@@ -0,0 +1,254 @@
+# Compact binary session format (.eeg)
+#
+# Layout:
+#   [header]  8-byte magic + JSON (channels, sample rate, sample/marker counts),
+#             padded to HEADER_SIZE so it can be rewritten in place
+#   [blocks]  BLOCK_SIZE samples each: float64 timestamps, then one float32
+#             column per channel. The last block is padded.
+#   [markers] side table of (float64 timestamp, float32 values[n_markers]),
+#             rewritten after the last block on every flush, with its CRC-32
+#             in the header
+#
+# The reader memory-maps the blocks and locates a time range with a binary
+# search on the timestamps, so only the requested samples are ever copied.
+
+import json
+import os
+import zlib
+from time import strftime, gmtime
+
+import numpy as np
+import pandas as pd
+
+from session_writer import IncrementalWriter
+
+MAGIC = b"MBEEG\x00\x01\x00"
+HEADER_SIZE = 4096
+BLOCK_SIZE = 2048
+
+
+def _block_dtype(n_channels, block_size):
+    return np.dtype([("timestamps", "<f8", (block_size,)), ("data", "<f4", (n_channels, block_size))])
+
+
+def _marker_dtype(n_markers):
+    return np.dtype([("timestamp", "<f8"), ("values", "<f4", (n_markers,))])
+
+
+class SessionFileWriter(IncrementalWriter):
+    """IncrementalWriter producing a .eeg session file instead of a CSV.
+
+    Same interface (`write`, `write_marker`, `set_time_correction`, `close`);
+    samples are appended block by block from the background thread.
+    """
+
+    def __init__(self, filename, ch_names, srate=0.0, block_size=BLOCK_SIZE, **kwargs):
+        self.srate = srate
+        self.block_size = block_size
+        self._blocks = 0
+        self._block_ts = np.empty(block_size)
+        self._block_data = np.empty((len(ch_names), block_size), dtype=np.float32)
+        self._fill = 0
+        self._full_blocks = []   # Blocks completed since the last flush, written by the next one
+        self._marker_table = []
+        kwargs["hold_back"] = 0  # Markers go to a side table: nothing to hold back
+        super().__init__(filename, ch_names, **kwargs)
+
+    def _open(self):
+        self._file = open(self.filename, "w+b")
+        self._block_bytes = _block_dtype(len(self.ch_names), self.block_size).itemsize
+        self._samples_on_disk = 0
+        self._write_header(0, marker_offset=0, table=b"")
+
+    def _write_header(self, n_samples, marker_offset, table):
+        header = {
+            "version": 1,
+            "channels": self.ch_names,
+            "srate": self.srate,
+            "block_size": self.block_size,
+            "n_samples": n_samples,
+            "n_markers": self.n_markers,
+            "marker_offset": marker_offset,
+            "marker_count": len(table) // _marker_dtype(self.n_markers).itemsize,
+            "marker_crc": zlib.crc32(table),
+            "created": strftime('%Y-%m-%d-%H.%M.%S', gmtime()),
+        }
+        raw = MAGIC + json.dumps(header).encode()
+        if len(raw) > HEADER_SIZE:
+            raise ValueError("Session header too large (%d channels)" % len(self.ch_names))
+        self._file.seek(0)
+        self._file.write(raw.ljust(HEADER_SIZE, b" "))
+
+    def _write_block(self, index, timestamps, data, fill):
+        # Padding keeps the timestamps sorted so the reader can search whole blocks
+        timestamps[fill:] = timestamps[fill - 1] if fill else 0
+        data[:, fill:] = 0
+        self._file.seek(HEADER_SIZE + index * self._block_bytes)
+        self._file.write(timestamps.tobytes())
+        self._file.write(data.tobytes())
+
+    def _flush(self, final=False):
+        if self._data:
+            data = np.concatenate(self._data)
+            timestamps = np.concatenate(self._timestamps)
+            if self.dejitter:
+                timestamps = self._dejittered(timestamps)
+            timestamps = timestamps + self.time_correction
+            self._index += len(timestamps)
+            self._data, self._timestamps = [], []
+
+            start = 0
+            while start < len(timestamps):
+                n = min(self.block_size - self._fill, len(timestamps) - start)
+                self._block_ts[self._fill:self._fill + n] = timestamps[start:start + n]
+                self._block_data[:, self._fill:self._fill + n] = data[start:start + n].T
+                self._fill += n
+                start += n
+                self.samples_written += n
+                if self._fill == self.block_size:
+                    self._full_blocks.append((self._block_ts.copy(), self._block_data.copy()))
+                    self._fill = 0
+
+        self._marker_table.extend((t + self.time_correction, values) for values, t in self._markers)
+        self._markers = []
+
+        # Every flush leaves a readable file, whatever write a crash interrupts:
+        # 1. the new marker table goes after the future last block, and the
+        #    header points to it while still counting only the samples already
+        #    on disk; 2. the blocks are written, over the old table that nothing
+        #    references any more; 3. the header takes the new sample count.
+        n_blocks = self._blocks + len(self._full_blocks) + (1 if self._fill else 0)
+        marker_offset = HEADER_SIZE + n_blocks * self._block_bytes
+        table = np.zeros(len(self._marker_table), dtype=_marker_dtype(self.n_markers))
+        if len(table):
+            table["timestamp"] = [t for t, _ in self._marker_table]
+            table["values"] = [values for _, values in self._marker_table]
+        table = table.tobytes()
+        self._file.seek(marker_offset)
+        self._file.write(table)
+        self._write_header(self._samples_on_disk, marker_offset, table)
+        self._file.flush()
+
+        for block_ts, block_data in self._full_blocks:
+            self._write_block(self._blocks, block_ts, block_data, self.block_size)
+            self._blocks += 1
+        self._full_blocks = []
+        if self._fill:
+            self._write_block(self._blocks, self._block_ts, self._block_data, self._fill)
+        if final and self._fill:
+            self._blocks, self._fill = self._blocks + 1, 0
+        self._file.flush()
+        self._write_header(self.samples_written, marker_offset, table)
+        self._file.flush()
+        self._samples_on_disk = self.samples_written
+
+
+class SessionFile:
+    """Memory-mapped reader for .eeg session files."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            raw = f.read(HEADER_SIZE)
+        if not raw.startswith(MAGIC):
+            raise ValueError("%s is not a session file" % path)
+        self.header = json.loads(raw[len(MAGIC):].decode().rstrip())
+        self.channels = self.header["channels"]
+        self.srate = self.header["srate"]
+        self.n_samples = self.header["n_samples"]
+        self.block_size = self.header["block_size"]
+
+        block_bytes = _block_dtype(len(self.channels), self.block_size).itemsize
+        file_size = os.path.getsize(path)
+        n_blocks = -(-self.n_samples // self.block_size)
+        # Interrupted write (crash between a block and the header): keep whole blocks only
+        if HEADER_SIZE + n_blocks * block_bytes > file_size:
+            n_blocks = max(file_size - HEADER_SIZE, 0) // block_bytes
+            self.n_samples = n_blocks * self.block_size
+        self._blocks = np.memmap(path, dtype=_block_dtype(len(self.channels), self.block_size), mode="r",
+                                 offset=HEADER_SIZE, shape=(n_blocks,)) if n_blocks else None
+        # Index: first timestamp of every block (small, kept in memory)
+        self._block_starts = np.array(self._blocks["timestamps"][:, 0]) if n_blocks else np.empty(0)
+
+        n_markers = self.header["n_markers"]
+        marker_count = self.header["marker_count"]
+        if self.header["marker_offset"] + marker_count * _marker_dtype(n_markers).itemsize > file_size:
+            marker_count = 0   # Table cut short by a crash during the flush
+        self.markers = np.zeros(0, dtype=_marker_dtype(n_markers))
+        if marker_count:
+            markers = np.fromfile(path, dtype=_marker_dtype(n_markers), count=marker_count,
+                                  offset=self.header["marker_offset"])
+            crc = self.header.get("marker_crc")   # Absent from files written before it was added
+            if crc is None or zlib.crc32(markers.tobytes()) == crc:
+                self.markers = markers
+
+    def __len__(self):
+        return self.n_samples
+
+    def searchsorted(self, t):
+        """Index of the first sample with timestamp >= t (binary search, block then sample)."""
+        if self.n_samples == 0:
+            return 0
+        block = max(int(np.searchsorted(self._block_starts, t, side="right")) - 1, 0)
+        row = int(np.searchsorted(self._blocks["timestamps"][block], t))
+        if row == self.block_size:
+            return min((block + 1) * self.block_size, self.n_samples)
+        return min(block * self.block_size + row, self.n_samples)
+
+    def samples(self, start=0, stop=None):
+        """Timestamps (n,) and data (n_channels, n) for samples [start, stop)."""
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        if stop <= start:
+            return np.empty(0), np.empty((len(self.channels), 0), dtype=np.float32)
+        first, last = start // self.block_size, (stop - 1) // self.block_size + 1
+        blocks = self._blocks[first:last]
+        offset = start - first * self.block_size
+        n = stop - start
+        timestamps = blocks["timestamps"].reshape(-1)[offset:offset + n]
+        data = blocks["data"].transpose(1, 0, 2).reshape(len(self.channels), -1)[:, offset:offset + n]
+        return timestamps, data
+
+    def time_range(self, t_start, t_stop):
+        """Samples with t_start <= timestamp < t_stop."""
+        return self.samples(self.searchsorted(t_start), self.searchsorted(t_stop))
+
+    def to_dataframe(self):
+        """Same columns as the CSV written by the recorder (markers held as states)."""
+        timestamps, data = self.samples()
+        df = pd.DataFrame(data.T, columns=self.channels)
+        df.insert(0, "timestamps", timestamps)
+        if self.header["n_markers"]:
+            ix = np.searchsorted(timestamps, self.markers["timestamp"])
+            values = np.zeros((len(timestamps), self.header["n_markers"]), dtype=np.float32)
+            for i, marker in zip(ix, self.markers["values"]):
+                values[i:] = marker
+            for i in range(values.shape[1]):
+                df["Marker%d" % i] = values[:, i]
+        return df
+
+
+def csv_to_session(csv_path, session_path=None, srate=256.0):
+    """Converts a recorder CSV into a .eeg session file."""
+    if session_path is None:
+        session_path = os.path.splitext(csv_path)[0] + ".eeg"
+    df = pd.read_csv(csv_path)
+    marker_columns = [c for c in df.columns if c.startswith("Marker")]
+    channels = [c for c in df.columns if c != "timestamps" and c not in marker_columns]
+
+    writer = SessionFileWriter(session_path, channels, srate=srate, n_markers=len(marker_columns))
+    writer.write(df[channels].to_numpy(), df["timestamps"].to_numpy())
+    if marker_columns:
+        # Only state changes go to the side table
+        markers = df[marker_columns].to_numpy()
+        changes = np.flatnonzero(np.any(np.diff(markers, axis=0, prepend=0) != 0, axis=1))
+        for i in changes:
+            writer.write_marker(markers[i], df["timestamps"].iloc[i])
+    writer.close()
+    return session_path
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        print("Wrote", csv_to_session(path))
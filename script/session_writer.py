@@ -0,0 +1,176 @@
+# Incremental replacement for muselsl.record._save
+#
+# _save re-concatenates everything recorded so far on every call, so memory and
+# flush cost grow with the session. IncrementalWriter only ever holds the last
+# few chunks: a background thread appends them to the CSV (same columns and
+# float format as _save) and forgets them.
+
+import os
+import queue
+import threading
+from time import monotonic
+
+import numpy as np
+
+_EEG = 0
+_MARKER = 1
+_STOP = 2
+
+
+class IncrementalWriter:
+    def __init__(
+        self,
+        filename,
+        ch_names,
+        n_markers=0,
+        flush_interval=5,
+        hold_back=0.5,
+        max_chunks=1024,
+        time_correction=0.0,
+        dejitter=False,
+        hold_markers=False,
+    ):
+        """Append-only CSV writer with a bounded buffer and a background flush thread.
+
+        Args:
+            filename (str): Output CSV, created with a header if it does not exist.
+            ch_names (list): Channel labels, written after the timestamps column.
+            n_markers (int): Number of Marker columns (0 for EEG only).
+            flush_interval (float): Seconds between two writes to disk.
+            hold_back (float): Seconds of the newest samples kept in memory so that
+                late markers can still be placed on their nearest sample.
+            max_chunks (int): Queue size; `write` blocks when the disk can't keep up.
+            time_correction (float): Added to the timestamps, see `set_time_correction`.
+            dejitter (bool): Regularise timestamps with a running linear fit.
+            hold_markers (bool): Markers are states (e.g. buttons held down): every
+                row carries the last marker received, instead of only the nearest row.
+        """
+        self.filename = filename
+        self.ch_names = list(ch_names)
+        self.n_markers = n_markers
+        self.flush_interval = flush_interval
+        self.hold_back = hold_back
+        self.time_correction = time_correction
+        self.dejitter = dejitter
+        self.hold_markers = hold_markers
+        self.samples_written = 0
+
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._data = []          # Pending EEG chunks (not yet written)
+        self._timestamps = []
+        self._markers = []       # Pending (values, timestamp)
+        self._marker_state = np.zeros(n_markers)
+        self._fit = np.zeros(5)  # n, sum(i), sum(t), sum(i*i), sum(i*t) for dejitter
+        self._index = 0
+
+        directory = os.path.dirname(filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._open()
+
+        self._thread = threading.Thread(target=self._run, name="IncrementalWriter", daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        new_file = not os.path.exists(self.filename)
+        self._file = open(self.filename, "a", newline="")
+        if new_file:
+            header = ["timestamps"] + self.ch_names + ["Marker%d" % i for i in range(self.n_markers)]
+            self._file.write(",".join(header) + "\n")
+
+    def write(self, data, timestamps):
+        """Queue a chunk as returned by `StreamInlet.pull_chunk`."""
+        if len(timestamps):
+            self._queue.put((_EEG, np.asarray(data, dtype=np.float64), np.asarray(timestamps, dtype=np.float64)))
+
+    def write_marker(self, marker, timestamp):
+        """Queue a marker; it is written on the EEG sample nearest to `timestamp`."""
+        self._queue.put((_MARKER, list(marker), timestamp))
+
+    def set_time_correction(self, time_correction):
+        self.time_correction = time_correction
+
+    def close(self):
+        """Write everything still pending and close the file."""
+        self._queue.put((_STOP, None, None))
+        self._thread.join()
+        self._file.close()
+
+    def _run(self):
+        last_flush = monotonic()
+        while True:
+            try:
+                kind, payload, timestamp = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                kind = None
+            if kind == _STOP:
+                self._flush(final=True)
+                return
+            if kind == _EEG:
+                self._data.append(payload)
+                self._timestamps.append(timestamp)
+            elif kind == _MARKER:
+                self._markers.append((payload, timestamp))
+
+            if monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = monotonic()
+
+    def _dejittered(self, timestamps):
+        # Running least squares of timestamp against sample index
+        index = np.arange(self._index, self._index + len(timestamps), dtype=np.float64)
+        self._fit += [len(index), index.sum(), timestamps.sum(), (index * index).sum(), (index * timestamps).sum()]
+        n, si, st, sii, sit = self._fit
+        denominator = n * sii - si * si
+        if denominator == 0:
+            return timestamps
+        slope = (n * sit - si * st) / denominator
+        return (st - slope * si) / n + slope * index
+
+    def _place_markers(self, columns, timestamps, final):
+        ready = [m for m in self._markers if final or m[1] <= timestamps[-1]]
+        self._markers = [m for m in self._markers if not (final or m[1] <= timestamps[-1])]
+
+        if self.hold_markers:
+            columns[:] = self._marker_state
+            for values, marker_time in sorted(ready, key=lambda m: m[1]):
+                columns[np.searchsorted(timestamps, marker_time):] = values
+                self._marker_state = np.asarray(values, dtype=np.float64)
+            return
+
+        columns[:] = 0
+        for values, marker_time in ready:
+            # Nearest written sample (markers older than the buffer land on its first row)
+            ix = min(int(np.searchsorted(timestamps, marker_time)), len(timestamps) - 1)
+            if ix > 0 and marker_time - timestamps[ix - 1] < timestamps[ix] - marker_time:
+                ix -= 1
+            columns[ix] = values
+
+    def _flush(self, final=False):
+        if not self._data:
+            return
+        data = np.concatenate(self._data)
+        timestamps = np.concatenate(self._timestamps)
+
+        # Keep the newest samples in memory unless this is the last flush
+        n = len(timestamps) if final else int(np.searchsorted(timestamps, timestamps[-1] - self.hold_back))
+        if n == 0:
+            self._data, self._timestamps = [data], [timestamps]
+            return
+
+        rows = np.empty((n, 1 + data.shape[1] + self.n_markers))
+        rows[:, 1:1 + data.shape[1]] = data[:n]
+        if self.n_markers:
+            self._place_markers(rows[:, 1 + data.shape[1]:], timestamps[:n], final)
+
+        written = timestamps[:n]
+        if self.dejitter:
+            written = self._dejittered(written)
+        rows[:, 0] = written + self.time_correction
+        self._index += n
+
+        # Marker columns as integers, like muselsl's _save
+        np.savetxt(self._file, rows, fmt=["%.3f"] * (1 + data.shape[1]) + ["%d"] * self.n_markers, delimiter=",")
+        self._file.flush()
+        self.samples_written += n
+        self._data, self._timestamps = [data[n:]], [timestamps[n:]]
@@ -0,0 +1,291 @@
+"""Une seule acquisition par casque, partagée entre processus par mémoire partagée.
+
+Le processus d'acquisition ouvre l'unique StreamInlet du casque et écrit les
+échantillons (horodatages déjà ramenés à l'horloge locale) dans un anneau en
+`multiprocessing.shared_memory`, avec un compteur de séquence. Chaque
+consommateur (enregistreur, prédicteur, visualisation...) s'y attache par son
+nom et lit avec son propre curseur : pas de réception réseau ni de décodage en
+double, et l'enregistrement contient exactement les échantillons vus par le modèle.
+
+    python shared_ring.py --name mindbot_eeg          # acquisition
+    BCI_predict.shared_ring = "mindbot_eeg"           # prédicteur
+    record_muse(..., ring="mindbot_eeg")              # enregistreur
+
+Un seul écrivain par anneau. Comme dans RingBuffer, chaque échantillon est écrit
+deux fois (`i` et `i + capacité`) : toute lecture est une tranche continue,
+renvoyée sans copie par `RingInlet.read`.
+"""
+import argparse
+import json
+import signal
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from pylsl import StreamInfo, StreamInlet, local_clock, resolve_byprop
+
+from ring_buffer import LSL_MAX_CHUNK
+
+# En-tête : compteur de séquence, capacité, canaux, fermé, taille du JSON, puis le JSON
+HEADER_SIZE = 4096
+_SEQ, _CAPACITY, _CHANNELS, _CLOSED, _META = range(5)
+META_OFFSET = 64
+TIME_CORRECTION_INTERVAL = 5.0
+
+
+class SharedRing:
+    """Vue numpy d'un anneau en mémoire partagée (en-tête, données, horodatages)."""
+
+    def __init__(self, shm):
+        self.shm = shm
+        self.header = np.ndarray(8, dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self.header[_CAPACITY])
+        self.n_channels = int(self.header[_CHANNELS])
+        meta = bytes(shm.buf[META_OFFSET:META_OFFSET + int(self.header[_META])])
+        self.meta = json.loads(meta.decode())
+        size = 2 * self.capacity
+        self.data = np.ndarray((size, self.n_channels), dtype=np.float32, buffer=shm.buf, offset=HEADER_SIZE)
+        self.timestamps = np.ndarray(size, dtype=np.float64, buffer=shm.buf,
+                                     offset=HEADER_SIZE + self.data.nbytes)
+
+    @classmethod
+    def create(cls, name, meta, capacity):
+        """Crée l'anneau ; `meta` décrit le flux (name, type, srate, source_id, labels)."""
+        n_channels = len(meta["labels"])
+        blob = json.dumps(meta).encode()
+        if META_OFFSET + len(blob) > HEADER_SIZE:
+            raise ValueError("Description du flux trop longue pour l'en-tête")
+        size = HEADER_SIZE + 2 * capacity * (n_channels * 4 + 8)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Reste d'une acquisition interrompue (redémarrage par le superviseur)
+            cls.attach(name).close(unlink=True)
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray(8, dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_CAPACITY] = capacity
+        header[_CHANNELS] = n_channels
+        header[_META] = len(blob)
+        shm.buf[META_OFFSET:META_OFFSET + len(blob)] = blob
+        del header
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            # Sinon le resource_tracker du consommateur détruirait l'anneau à sa sortie
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm)
+
+    @property
+    def seq(self):
+        """Nombre total d'échantillons écrits depuis la création."""
+        return int(self.header[_SEQ])
+
+    @property
+    def closed(self):
+        return bool(self.header[_CLOSED])
+
+    def write(self, chunk, timestamps):
+        """Écrivain : ajoute un chunk (n, n_channels), puis publie le nouveau compteur."""
+        n = len(timestamps)
+        if n == 0:
+            return
+        C = self.capacity
+        if n > C:
+            chunk, timestamps = chunk[-C:], timestamps[-C:]
+            self.header[_SEQ] += n - C
+            n = C
+        head = self.seq % C
+        first = min(n, C - head)
+        for offset in (0, C):
+            self.data[head + offset:head + offset + first] = chunk[:first]
+            self.timestamps[head + offset:head + offset + first] = timestamps[:first]
+            if n > first:
+                self.data[offset:offset + n - first] = chunk[first:]
+                self.timestamps[offset:offset + n - first] = timestamps[first:]
+        # Les données sont en place avant que le compteur ne les rende visibles
+        self.header[_SEQ] += n
+
+    def close(self, unlink=False):
+        del self.header, self.data, self.timestamps
+        if unlink:
+            self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Une vue renvoyée par `read` est encore référencée : libérée avec elle
+
+
+class RingInlet:
+    """Consommateur d'un anneau, avec l'interface de StreamInlet utilisée par le projet.
+
+    `pull_chunk` copie (comme pylsl) ; `read` renvoie des vues sur la mémoire
+    partagée, valables tant que l'écrivain n'a pas fait le tour de l'anneau : à
+    consommer tout de suite (InferenceScheduler recopie dans son buffer).
+
+    Args:
+        name (str): Nom de l'anneau.
+        backlog (int): Échantillons déjà présents à relire à l'attache (0 : seulement les nouveaux).
+        headroom (float): Fraction de l'anneau gardée d'avance sur l'écrivain ; un
+            consommateur plus en retard saute au plus ancien échantillon sûr.
+    """
+
+    def __init__(self, name, backlog=0, headroom=0.25):
+        self.ring = SharedRing.attach(name)
+        self.max_lag = int(self.ring.capacity * (1 - headroom))
+        seq = self.ring.seq
+        self.cursor = max(seq - min(backlog, self.max_lag), 0)
+        self.overruns = 0      # Échantillons perdus parce que le consommateur était trop lent
+        self._info = None
+
+    def info(self, timeout=None):
+        if self._info is None:
+            meta = self.ring.meta
+            self._info = StreamInfo(meta["name"], meta["type"], self.ring.n_channels, meta["srate"],
+                                    'float32', meta["source_id"])
+            channels = self._info.desc().append_child("channels")
+            for label in meta["labels"]:
+                channels.append_child("channel").append_child_value("label", label)
+        return self._info
+
+    def time_correction(self, timeout=None):
+        # Horodatages déjà sur l'horloge locale (corrigés par l'acquisition)
+        return 0.0
+
+    def open_stream(self, timeout=None):
+        pass
+
+    def close_stream(self):
+        pass
+
+    @property
+    def available(self):
+        return self.ring.seq - self.cursor
+
+    def read(self, max_samples=LSL_MAX_CHUNK, timeout=0.0):
+        """Renvoie (données, horodatages), vues sur l'anneau ; vides si rien n'arrive avant `timeout`."""
+        deadline = None
+        while True:
+            seq = self.ring.seq
+            if seq > self.cursor or timeout <= 0.0:
+                break
+            if deadline is None:
+                deadline = time.perf_counter() + timeout
+            elif time.perf_counter() >= deadline or self.ring.closed:
+                break
+            time.sleep(0.001)
+        if seq - self.cursor > self.max_lag:
+            self.overruns += seq - self.max_lag - self.cursor
+            self.cursor = seq - self.max_lag
+        n = min(seq - self.cursor, max_samples)
+        start = self.cursor % self.ring.capacity
+        self.cursor += n
+        return self.ring.data[start:start + n], self.ring.timestamps[start:start + n]
+
+    def pull_chunk(self, timeout=0.0, max_samples=1024, dest_obj=None):
+        data, timestamps = self.read(max_samples, timeout)
+        if dest_obj is not None:
+            dest_obj[:len(timestamps)] = data
+            return dest_obj, timestamps.tolist()
+        return data.tolist(), timestamps.tolist()
+
+    def close(self):
+        self.ring.close()
+
+
+class RingReader:
+    """Équivalent d'InletReader pour InferenceScheduler, sans copie intermédiaire."""
+
+    def __init__(self, inlet, max_samples=LSL_MAX_CHUNK):
+        self.inlet = inlet
+        self.channel_count = inlet.ring.n_channels
+        self.max_samples = max_samples
+
+    def pull(self, timeout=0.0):
+        return self.inlet.read(self.max_samples, timeout)
+
+
+def wait_for_ring(name, timeout=30.0, alive=None):
+    """Attend que l'anneau existe et reçoive des échantillons (test de disponibilité d'orchestrator.py)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if alive is not None and not alive():
+            return False
+        try:
+            ring = SharedRing.attach(name)
+        except FileNotFoundError:
+            time.sleep(0.05)
+            continue
+        try:
+            while time.monotonic() < deadline and not ring.closed:
+                if ring.seq > 0:
+                    return True
+                if alive is not None and not alive():
+                    return False
+                time.sleep(0.01)
+        finally:
+            ring.close()
+    return False
+
+
+def _stream_meta(info):
+    labels = []
+    channel = info.desc().child('channels').first_child()
+    for i in range(info.channel_count()):
+        labels.append(channel.child_value('label') or "ch%d" % i)
+        channel = channel.next_sibling()
+    return {"name": info.name(), "type": info.type(), "srate": info.nominal_srate(),
+            "source_id": info.source_id(), "labels": labels}
+
+
+def run_acquisition(name, stream_type="EEG", seconds=30.0, stop_event=None, timeout=30.0, ready_event=None):
+    """Processus d'acquisition : un inlet LSL -> l'anneau `name`, jusqu'à `stop_event`.
+
+    Args:
+        seconds (float): Durée couverte par l'anneau, donc retard maximal d'un consommateur.
+    """
+    # terminate() du superviseur : sortir par le finally pour libérer l'anneau
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    streams = resolve_byprop('type', stream_type, timeout=timeout)
+    if not streams:
+        print(f"⚠️ Aucun flux {stream_type} trouvé")
+        return
+    inlet = StreamInlet(streams[0], max_chunklen=LSL_MAX_CHUNK)
+    info = inlet.info()
+    srate = info.nominal_srate() or 256
+    ring = SharedRing.create(name, _stream_meta(info), int(seconds * srate))
+    chunk = np.empty((LSL_MAX_CHUNK, info.channel_count()), dtype=np.float32)
+    time_correction = inlet.time_correction()
+    last_correction = local_clock()
+    print(f"✅ {info.name()} -> anneau partagé '{name}' ({ring.capacity} échantillons)")
+    if ready_event is not None:
+        ready_event.set()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            _, timestamps = inlet.pull_chunk(timeout=0.2, max_samples=LSL_MAX_CHUNK, dest_obj=chunk)
+            if not timestamps:
+                continue
+            if local_clock() - last_correction > TIME_CORRECTION_INTERVAL:
+                time_correction = inlet.time_correction()
+                last_correction = local_clock()
+            ring.write(chunk[:len(timestamps)], np.asarray(timestamps) + time_correction)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.header[_CLOSED] = 1
+        ring.close(unlink=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Acquisition unique d'un casque dans un anneau partagé")
+    parser.add_argument("--name", default="mindbot_eeg", help="Nom de l'anneau (mémoire partagée)")
+    parser.add_argument("--type", default="EEG", help="Type du flux LSL")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Durée couverte par l'anneau")
+    args = parser.parse_args()
+    run_acquisition(args.name, args.type, args.seconds)
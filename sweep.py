@@ -0,0 +1,293 @@
+"""Validation croisée et balayage des hyperparamètres et des seuils de décision.
+
+Chaque (configuration, fold) est entraîné dans son propre processus ; les
+fenêtres sont écrites une fois dans un .npy que tous les processus lisent en
+memory-map (lecture seule, partagée par le cache disque). Les sorties des folds
+de test sont ensuite rejouées, enregistrement par enregistrement et dans l'ordre
+du flux, à travers l'étage de décision de BCI_predict :
+
+- "raw" : BCI_predict.decide pour chaque paire de seuils (gauche, droite) ;
+- "ema" / "vote" : DecisionEngine pour chaque (seuil d'entrée, seuil de sortie,
+  durée minimale), avec ses commandes/min et son retard de décision.
+
+    python sweep.py data/epochs --folds 5 --lr 0.001 0.0003 --epochs 10 20 --output sweep.csv
+    python sweep.py data/epochs --decision ema --enter 0.6 0.7 0.8 --exit 0.4 0.5 --dwell 0 0.25
+
+Les fenêtres d'un jeu build_dataset.py sont prises dans les segments étiquetés
+(transitions écartées) : le flux rejoué saute ces marges.
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+import pandas as pd
+import torch
+
+import BCI_predict
+from BCI_predict import decide
+from decision import CLASSES, DecisionEngine
+from train import load_training_data, train
+
+# Seuils essayés par défaut (sur les sorties brutes du modèle, comme decide)
+THRESHOLDS = [0.0, 0.25, 0.5, 0.75, 0.85, 0.95, 1.0, 1.5, 2.0, 3.0]
+# Étage lissé : probabilités (softmax) d'entrée et de sortie, durée minimale (s)
+ENTER_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9]
+EXIT_THRESHOLDS = [0.3, 0.4, 0.5, 0.6]
+DWELLS = [0.0, 0.25, 0.5]
+DECISIONS = ["raw", "ema", "vote"]
+METRICS = ["accuracy", "command_rate", "false_move_rate", "false_moves_per_min", "commands_per_min"]
+
+_shared = {}
+
+
+def make_folds(groups, k=5, seed=0):
+    """Fold de chaque fenêtre ; par enregistrements entiers dès qu'il y en a au moins k.
+
+    Des fenêtres qui se chevauchent ne doivent pas se retrouver de part et d'autre
+    d'un split : avec moins de k enregistrements, on retombe sur des fenêtres
+    tirées au hasard (estimation optimiste).
+    """
+    rng = np.random.default_rng(seed)
+    unique = np.unique(groups)
+    if len(unique) >= k:
+        fold_of_group = dict(zip(rng.permutation(unique), np.arange(len(unique)) % k))
+        return np.array([fold_of_group[g] for g in groups])
+    print("⚠️ Moins de %d enregistrements : folds par fenêtres (fenêtres voisines mélangées)" % k)
+    return rng.permutation(len(groups)) % k
+
+
+def _init_worker(windows_path, labels, folds):
+    # Une seule fois par processus : le dataset reste partagé en lecture seule
+    _shared["windows"] = np.load(windows_path, mmap_mode="r")
+    _shared["labels"] = labels
+    _shared["folds"] = folds
+
+
+def _run_fold(task):
+    config, fold, seed = task
+    windows, labels, folds = _shared["windows"], _shared["labels"], _shared["folds"]
+    train_idx, test_idx = np.flatnonzero(folds != fold), np.flatnonzero(folds == fold)
+
+    start = time.perf_counter()
+    model, _ = train(windows[train_idx], labels[train_idx], val_fraction=0, seed=seed, num_threads=1,
+                     verbose=False, **config)
+    x = torch.from_numpy(np.ascontiguousarray(windows[test_idx])).unsqueeze(-1)
+    with torch.inference_mode():
+        outputs = torch.cat([model(x[i:i + 1024]) for i in range(0, len(x), 1024)]).numpy()
+    return config, fold, test_idx, outputs, time.perf_counter() - start
+
+
+def dataset_period(source, hop=256, fs=256):
+    """Secondes entre deux fenêtres consécutives d'un enregistrement du jeu.
+
+    Le pas de build_dataset.py (meta.json), sinon celui passé à
+    train.load_training_data pour les CSV pré-découpés.
+    """
+    meta_path = os.path.join(source, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        hop, fs = meta["hop"], meta["fs"]
+    return hop / fs
+
+
+def command_metrics(commands, truth, seconds_per_window):
+    """Métriques d'une suite de commandes face aux commandes attendues.
+
+    accuracy            : part des fenêtres avec la bonne commande
+    command_rate        : part des fenêtres qui envoient un mouvement (left/right)
+    false_move_rate     : part des mouvements envoyés qui sont faux (stop attendu ou mauvais côté)
+    false_moves_per_min : mouvements faux par minute de conduite, une fenêtre toutes les `seconds_per_window` s
+    """
+    moves = commands != "stop"
+    false_moves = moves & (commands != truth)
+    return {
+        "accuracy": float((commands == truth).mean()),
+        "command_rate": float(moves.mean()),
+        "false_move_rate": float(false_moves.sum() / max(moves.sum(), 1)),
+        "false_moves_per_min": float(false_moves.sum() / (len(truth) * seconds_per_window / 60)),
+    }
+
+
+def commands_per_min(commands, groups, seconds_per_window):
+    """Changements de commande par minute (chaque flux démarre à l'arrêt)."""
+    previous = np.concatenate([["stop"], commands[:-1]])
+    previous[np.flatnonzero(np.diff(groups, prepend=np.nan) != 0)] = "stop"
+    return float((commands != previous).sum() / (len(commands) * seconds_per_window / 60))
+
+
+def threshold_sweep(outputs, labels, groups, left_values=THRESHOLDS, right_values=THRESHOLDS, period=1.0):
+    """Une ligne de métriques par paire de seuils, sur les sorties hors-fold (n, 3) dans l'ordre du flux."""
+    truth = np.array(CLASSES)[labels]
+    rows = []
+    for left, right in itertools.product(left_values, right_values):
+        commands = decide(outputs, left, right)
+        rows.append(dict(decision="raw", left_threshold=left, right_threshold=right,
+                         **command_metrics(commands, truth, period),
+                         commands_per_min=commands_per_min(commands, groups, period)))
+    return rows
+
+
+def decision_sweep(outputs, labels, groups, modes=("ema", "vote"), enter_values=ENTER_THRESHOLDS,
+                   exit_values=EXIT_THRESHOLDS, dwell_values=DWELLS, period=1.0):
+    """Une ligne par réglage de DecisionEngine, rejoué sur chaque enregistrement (sorties dans l'ordre du flux).
+
+    Les seuils de sortie supérieurs au seuil d'entrée (pas d'hystérésis) sont ignorés.
+    """
+    truth = np.array(CLASSES)[labels]
+    bounds = np.flatnonzero(np.diff(groups, prepend=np.nan, append=np.nan) != 0)
+    rows = []
+    for mode, enter, exit_, dwell in itertools.product(modes, enter_values, exit_values, dwell_values):
+        if exit_ > enter:
+            continue
+        commands, changes, latencies = [], 0, []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            engine = DecisionEngine(period, smoothing=mode, enter_threshold=enter, exit_threshold=exit_,
+                                    min_dwell=dwell, history=int(stop - start))
+            commands.append(engine.run(outputs[start:stop]))
+            changes += engine.changes
+            latencies.extend(engine.latencies)
+        commands = np.concatenate(commands)
+        latencies = np.asarray(latencies) * 1000
+        rows.append(dict(decision=mode, enter_threshold=enter, exit_threshold=exit_, min_dwell=dwell,
+                         **command_metrics(commands, truth, period),
+                         commands_per_min=changes / (len(commands) * period / 60),
+                         latency_ms_p50=float(np.percentile(latencies, 50)) if len(latencies) else 0.0))
+    return rows
+
+
+def current_rule(report):
+    """Lignes du rapport qui correspondent à la règle configurée dans BCI_predict."""
+    if BCI_predict.decision == "raw":
+        mask = ((report["decision"] == "raw") & (report["left_threshold"] == BCI_predict.left_threshold)
+                & (report["right_threshold"] == BCI_predict.right_threshold))
+        label = "raw, seuils %.2f / %.2f" % (BCI_predict.left_threshold, BCI_predict.right_threshold)
+    else:
+        mask = ((report["decision"] == BCI_predict.decision)
+                & np.isclose(report["enter_threshold"], BCI_predict.enter_threshold)
+                & np.isclose(report["exit_threshold"], BCI_predict.exit_threshold)
+                & np.isclose(report["min_dwell"], BCI_predict.min_dwell))
+        label = "%s, entrée %.2f, sortie %.2f, durée min %.2f s" % (
+            BCI_predict.decision, BCI_predict.enter_threshold, BCI_predict.exit_threshold, BCI_predict.min_dwell)
+    return report[mask], label
+
+
+def sweep(windows, labels, groups, grid, folds=5, workers=None, seed=0, left_values=THRESHOLDS,
+          right_values=THRESHOLDS, times=None, decisions=DECISIONS, enter_values=ENTER_THRESHOLDS,
+          exit_values=EXIT_THRESHOLDS, dwell_values=DWELLS, period=1.0, verbose=True):
+    """k-fold pour chaque configuration de `grid` (liste de kwargs de train.train).
+
+    Args:
+        times (np.ndarray, optional): Instant de chaque fenêtre dans son
+            enregistrement (train.load_training_data(with_times=True)) ; sans,
+            l'ordre du jeu de données est pris pour l'ordre du flux.
+        decisions (list): Étages de décision évalués ("raw", "ema", "vote").
+        period (float): Secondes entre deux fenêtres consécutives d'un
+            enregistrement (dataset_period) : cadence de l'étage de décision
+            rejoué et base des taux par minute.
+
+    Returns:
+        DataFrame : une ligne par (configuration, règle de décision), avec les
+        métriques hors-fold et la précision argmax moyenne / écart-type des folds.
+    """
+    fold_of = make_folds(groups, folds, seed)
+    tasks = [(config, fold, seed) for config in grid for fold in range(folds)]
+    workers = min(workers or cpu_count(), len(tasks))
+
+    start = time.perf_counter()
+    outputs = {}
+    fold_accuracy = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        windows_path = os.path.join(tmp, "windows.npy")
+        np.save(windows_path, np.asarray(windows, dtype=np.float32))
+        with Pool(workers, initializer=_init_worker, initargs=(windows_path, labels, fold_of)) as pool:
+            for config, fold, test_idx, output, seconds in pool.imap_unordered(_run_fold, tasks):
+                key = tuple(sorted(config.items()))
+                outputs.setdefault(key, np.empty((len(labels), len(CLASSES)), np.float32))[test_idx] = output
+                accuracy = float((output.argmax(axis=1) == labels[test_idx]).mean())
+                fold_accuracy.setdefault(key, []).append(accuracy)
+                if verbose:
+                    print("%s fold %d : %.1f%% (%.1f s)" % (dict(config), fold, 100 * accuracy, seconds))
+
+    # Flux rejoué enregistrement par enregistrement, dans l'ordre chronologique
+    order = np.lexsort((np.arange(len(labels)) if times is None else times, groups))
+    smoothed = [mode for mode in decisions if mode != "raw"]
+    rows = []
+    for key, output in outputs.items():
+        decision_rows = []
+        if "raw" in decisions:
+            decision_rows += threshold_sweep(output[order], labels[order], groups[order], left_values, right_values,
+                                             period)
+        if smoothed:
+            decision_rows += decision_sweep(output[order], labels[order], groups[order], smoothed,
+                                            enter_values, exit_values, dwell_values, period)
+        for row in decision_rows:
+            row.update(key)
+            row["fold_acc_mean"] = float(np.mean(fold_accuracy[key]))
+            row["fold_acc_std"] = float(np.std(fold_accuracy[key]))
+            rows.append(row)
+    if verbose:
+        print("%d entraînements en %.1f s sur %d processus" % (len(tasks), time.perf_counter() - start, workers))
+    report = pd.DataFrame(rows)
+    # Paramètres de la règle de décision en tête, puis les métriques
+    rule = [c for c in ["decision", "left_threshold", "right_threshold", "enter_threshold", "exit_threshold",
+                        "min_dwell"] if c in report.columns]
+    return report[rule + [c for c in report.columns if c not in rule]]
+
+
+def rank(report, by="accuracy", max_false_moves_per_min=None):
+    """Tri du rapport : `by` décroissant, à taux de faux mouvements croissant à égalité."""
+    if max_false_moves_per_min is not None:
+        report = report[report["false_moves_per_min"] <= max_false_moves_per_min]
+    ascending = by.startswith("false") or by == "commands_per_min"
+    return report.sort_values([by, "false_move_rate"], ascending=[ascending, True]).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validation croisée et balayage des seuils de décision")
+    parser.add_argument("data", help="Dossier de build_dataset.py ou de CSV pré-découpés")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Default: nombre de cœurs")
+    parser.add_argument("--lr", type=float, nargs="+", default=[0.001])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[32])
+    parser.add_argument("--epochs", type=int, nargs="+", default=[10])
+    parser.add_argument("--left", type=float, nargs="+", default=THRESHOLDS, help="Seuils gauche essayés")
+    parser.add_argument("--right", type=float, nargs="+", default=THRESHOLDS, help="Seuils droite essayés")
+    parser.add_argument("--decision", nargs="+", default=DECISIONS, choices=DECISIONS, help="Étages de décision évalués")
+    parser.add_argument("--enter", type=float, nargs="+", default=ENTER_THRESHOLDS, help="Seuils d'entrée essayés (ema/vote)")
+    parser.add_argument("--exit", type=float, nargs="+", default=EXIT_THRESHOLDS, help="Seuils de sortie essayés (ema/vote)")
+    parser.add_argument("--dwell", type=float, nargs="+", default=DWELLS, help="Durées minimales essayées (s)")
+    parser.add_argument("--rank-by", default="accuracy", choices=METRICS)
+    parser.add_argument("--max-false-moves", type=float, default=None, help="Faux mouvements/min maximum")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Rapport complet (CSV)")
+    args = parser.parse_args()
+
+    windows, labels, groups, times = load_training_data(args.data, with_times=True)
+    grid = [dict(lr=lr, batch_size=batch_size, epochs=epochs)
+            for lr, batch_size, epochs in itertools.product(args.lr, args.batch_size, args.epochs)]
+    # La règle en service est toujours évaluée, pour comparer
+    left = sorted(set(args.left) | {BCI_predict.left_threshold})
+    right = sorted(set(args.right) | {BCI_predict.right_threshold})
+    enter = sorted(set(args.enter) | {BCI_predict.enter_threshold})
+    exit_ = sorted(set(args.exit) | {BCI_predict.exit_threshold})
+    dwell = sorted(set(args.dwell) | {BCI_predict.min_dwell})
+    decisions = sorted(set(args.decision) | {BCI_predict.decision}, key=DECISIONS.index)
+    report = rank(sweep(windows, labels, groups, grid, args.folds, args.workers, args.seed, left, right,
+                        times, decisions, enter, exit_, dwell, dataset_period(args.data)),
+                  args.rank_by, args.max_false_moves)
+
+    current, rule = current_rule(report)
+    with pd.option_context("display.width", 250, "display.max_columns", 25):
+        print(report.head(args.top).round(4).to_string())
+        if len(current):
+            print("\nRègle actuelle de BCI_predict (%s) :" % rule)
+            print(current.head(3).round(4).to_string())
+    if args.output:
+        report.to_csv(args.output, index=False)
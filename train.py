@@ -0,0 +1,248 @@
+"""Entraînement d'EEGNet sur CPU, sans notebook.
+
+    python train.py data/epochs --epochs 30 --output model/model.pth
+    python train.py data/epochs --epochs 60 --resume   # reprend au dernier checkpoint
+
+La source est un dossier écrit par build_dataset.py (meta.json) ou un dossier de
+CSV pré-découpés nommés "<label>_<n>.csv" (dataset.EEGDataset). Le modèle
+exporté est un state_dict chargé tel quel par BCI_predict.load_model.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from EEGNet import EEGNet
+from build_dataset import load_dataset
+from dataset import LABEL_MAP, EEGDataset
+from inference import load_eegnet
+
+# Classes du modèle, dans l'ordre des sorties attendu par BCI_predict.decide (gauche, droite, stop)
+TRAIN_LABELS = ["gauche", "droite", "stop"]
+
+
+def load_training_data(source, labels=TRAIN_LABELS, hop=256, with_times=False):
+    """Fenêtres (n, channels, samples) float32, classes (n,) et groupes (n,) d'une source.
+
+    Les classes sont réindexées dans l'ordre de `labels` ; les fenêtres des
+    autres classes (avant, arrière) sont écartées. Le groupe est l'enregistrement
+    d'origine, pour une validation qui ne mélange pas deux sessions. Avec
+    `with_times`, renvoie aussi l'instant de chaque fenêtre dans son
+    enregistrement (horodatage de build_dataset.py, sinon rang dans le fichier),
+    pour rejouer les fenêtres dans l'ordre du flux.
+    """
+    if os.path.exists(os.path.join(source, "meta.json")):
+        windows, y, groups, meta = load_dataset(source)
+        label_map = meta["label_map"]
+        times_path = os.path.join(source, "timestamps.npy")
+        times = np.load(times_path) if os.path.exists(times_path) else np.arange(len(y), dtype=np.float64)
+    else:
+        dataset = EEGDataset(source, hop=hop)
+        windows = np.concatenate(dataset.windows) if dataset.windows else np.empty((0, 4, 256), np.float32)
+        y = dataset.labels()
+        groups = np.repeat(np.arange(len(dataset.files)), np.diff(dataset.offsets))
+        times = np.arange(len(y), dtype=np.float64)
+        label_map = LABEL_MAP
+
+    remap = np.full(max(label_map.values()) + 1, -1, dtype=np.int64)
+    for index, name in enumerate(labels):
+        remap[label_map[name]] = index
+    y = remap[y]
+    keep = np.flatnonzero(y >= 0)
+    if with_times:
+        return np.ascontiguousarray(windows[keep], dtype=np.float32), y[keep], groups[keep], times[keep]
+    return np.ascontiguousarray(windows[keep], dtype=np.float32), y[keep], groups[keep]
+
+
+def split_groups(groups, val_fraction=0.2, seed=0):
+    """Masque de validation : des enregistrements entiers tirés au hasard (au moins un)."""
+    unique = np.unique(groups)
+    if val_fraction <= 0 or len(unique) < 2:
+        return np.zeros(len(groups), dtype=bool)
+    n_val = max(1, int(round(len(unique) * val_fraction)))
+    val = np.random.default_rng(seed).choice(unique, n_val, replace=False)
+    return np.isin(groups, val)
+
+
+def configure_threads(num_threads=None):
+    """Un thread intra-op par cœur, un seul inter-op (le modèle est séquentiel).
+
+    Pas de workers DataLoader : les données sont déjà des tenseurs en mémoire,
+    un lot n'est qu'un index_select, plus rapide que tout passage inter-processus.
+    """
+    num_threads = num_threads or os.cpu_count()
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Déjà fixé (ne peut l'être qu'une fois par processus)
+    return num_threads
+
+
+def evaluate(model, x, y, batch_size=1024):
+    """(perte moyenne, précision) sur des tenseurs en mémoire."""
+    model.eval()
+    criterion = nn.CrossEntropyLoss(reduction="sum")
+    loss, correct = 0.0, 0
+    with torch.inference_mode():
+        for start in range(0, len(x), batch_size):
+            output = model(x[start:start + batch_size])
+            loss += criterion(output, y[start:start + batch_size]).item()
+            correct += (output.argmax(dim=1) == y[start:start + batch_size]).sum().item()
+    return loss / max(len(x), 1), correct / max(len(x), 1)
+
+
+def save_checkpoint(path, model, optimizer, generator, epoch, history, best):
+    state = {
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "generator": generator.get_state(),
+        "rng": torch.get_rng_state(),  # Dropout
+        "epoch": epoch,
+        "history": history,
+        "best": best,
+    }
+    tmp_path = path + ".tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)  # Un checkpoint interrompu n'écrase jamais le précédent
+
+
+def export_model(model, path):
+    """Écrit le state_dict lu par inference.load_state_dict (donc par BCI_predict)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    state = {k: v.detach().cpu().clone() for k, v in model.state_dict().items()}
+    tmp_path = path + ".tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def train(
+    windows,
+    labels,
+    groups=None,
+    epochs=30,
+    batch_size=32,
+    lr=0.001,
+    val_fraction=0.2,
+    seed=0,
+    num_threads=None,
+    checkpoint=None,
+    resume=False,
+    verbose=True,
+):
+    """Entraîne EEGNet sur des fenêtres en mémoire (n, channels, samples).
+
+    Args:
+        groups (array, optional): Enregistrement de chaque fenêtre ; la validation
+            se fait sur des enregistrements entiers (`val_fraction`).
+        checkpoint (str, optional): Fichier écrit à chaque époque (modèle, optimiseur,
+            générateur aléatoire, historique) ; avec `resume`, l'entraînement reprend
+            à l'époque suivante, avec le même ordre des lots qu'un entraînement d'une traite.
+
+    Returns:
+        (model, history) : le meilleur modèle en validation (le dernier sans
+        validation) et une liste de dicts par époque.
+    """
+    num_threads = configure_threads(num_threads)
+    torch.manual_seed(seed)
+
+    x = torch.from_numpy(np.asarray(windows, dtype=np.float32)).unsqueeze(-1)  # (n, channels, samples, 1)
+    y = torch.from_numpy(np.asarray(labels, dtype=np.int64))
+    val = split_groups(np.zeros(len(y)) if groups is None else groups, val_fraction, seed)
+    x_train, y_train = x[torch.from_numpy(~val)], y[torch.from_numpy(~val)]
+    x_val, y_val = x[torch.from_numpy(val)], y[torch.from_numpy(val)]
+
+    # La forme des fenêtres est enregistrée avec le modèle (EEGNet.input_shape)
+    model = EEGNet(num_classes=len(TRAIN_LABELS), n_channels=x.shape[1], n_samples=x.shape[2])
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    criterion = nn.CrossEntropyLoss()
+    generator = torch.Generator().manual_seed(seed)
+    history, best, first_epoch = [], None, 0
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        state = torch.load(checkpoint, map_location="cpu", weights_only=False)
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        generator.set_state(state["generator"])
+        torch.set_rng_state(state["rng"])
+        history, best, first_epoch = state["history"], state["best"], state["epoch"] + 1
+        if verbose:
+            print(f"Reprise à l'époque {first_epoch + 1} ({checkpoint})")
+
+    if verbose:
+        print(f"{len(x_train)} fenêtres d'entraînement, {len(x_val)} de validation, {num_threads} threads")
+
+    for epoch in range(first_epoch, epochs):
+        model.train()
+        start = time.perf_counter()
+        order = torch.randperm(len(x_train), generator=generator)
+        total_loss = 0.0
+        for i in range(0, len(order), batch_size):
+            batch = order[i:i + batch_size]
+            optimizer.zero_grad()
+            loss = criterion(model(x_train[batch]), y_train[batch])
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        elapsed = time.perf_counter() - start
+
+        record = {
+            "epoch": epoch + 1,
+            "loss": total_loss / max(len(x_train), 1),
+            "samples_per_s": len(x_train) / elapsed,
+            "seconds": elapsed,
+        }
+        if len(x_val):
+            record["val_loss"], record["val_acc"] = evaluate(model, x_val, y_val)
+            if best is None or record["val_acc"] > best["val_acc"]:
+                best = {"epoch": epoch + 1, "val_acc": record["val_acc"],
+                        "model": {k: v.clone() for k, v in model.state_dict().items()}}
+        history.append(record)
+
+        if verbose:
+            line = f"Epoch {epoch + 1}/{epochs}, Loss: {record['loss']:.4f}, {record['samples_per_s']:.0f} samples/s"
+            if len(x_val):
+                line += f", Val: {record['val_loss']:.4f} / {record['val_acc']:.1%}"
+            print(line)
+        if checkpoint:
+            save_checkpoint(checkpoint, model, optimizer, generator, epoch, history, best)
+
+    if best is not None:
+        model.load_state_dict(best["model"])
+        if verbose:
+            print(f"Meilleure époque : {best['epoch']} ({best['val_acc']:.1%} en validation)")
+    return model.eval(), history
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Entraînement d'EEGNet sur CPU")
+    parser.add_argument("data", help="Dossier de build_dataset.py ou de CSV pré-découpés")
+    parser.add_argument("--output", default="model/model.pth")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=0.001)
+    parser.add_argument("--val-fraction", type=float, default=0.2, help="Part des enregistrements gardés pour la validation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=None, help="Default: nombre de cœurs")
+    parser.add_argument("--checkpoint", default=None, help="Default: <output>.ckpt")
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args()
+
+    windows, labels, groups = load_training_data(args.data)
+    print("Par classe :", dict(zip(TRAIN_LABELS, np.bincount(labels, minlength=len(TRAIN_LABELS)).tolist())))
+    model, history = train(windows, labels, groups, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+                           val_fraction=args.val_fraction, seed=args.seed, num_threads=args.threads,
+                           checkpoint=args.checkpoint or args.output + ".ckpt", resume=args.resume)
+
+    export_model(model, args.output)
+    # Vérifie que le fichier est bien celui que charge le prédicteur
+    reloaded = load_eegnet(args.output, num_classes=len(TRAIN_LABELS))
+    probe = torch.from_numpy(windows[:8]).unsqueeze(-1)
+    with torch.inference_mode():
+        assert torch.allclose(reloaded(probe), model(probe), atol=1e-5)
+    print("✅ Modèle entraîné et exporté :", args.output)